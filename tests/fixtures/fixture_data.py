@@ -2,6 +2,7 @@ import tempfile
 
 import pytest
 from mixer.backend.django import mixer as _mixer
+from posts import thumbnails
 from posts.models import Post, Group
 
 
@@ -10,6 +11,20 @@ def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
         yield temp_directory
+        # миниатюры готовятся в фоне: ждём их до удаления каталога
+        thumbnails.shutdown()
+
+
+class InlineExecutor:
+    def submit(self, function, *args):
+        function(*args)
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(monkeypatch):
+    # страницы отдают варианты картинок фоновому пулу; в тестах он
+    # синхронный, иначе потоки делят SQLite в памяти с самим тестом
+    monkeypatch.setattr(thumbnails, 'get_executor', InlineExecutor)
 
 
 @pytest.fixture
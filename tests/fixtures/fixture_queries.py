@@ -0,0 +1,25 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture
+def count_queries(settings):
+    """
+    Возвращает функцию, которая выполняет запрос клиентом с пустым кэшем
+    страниц и отдаёт число SQL-запросов, посчитанное QueryBudgetMiddleware.
+    GET-запрос сначала выполняется вхолостую, чтобы миниатюры (у них свой
+    кэш) были уже готовы, как на рабочем сервере.
+    """
+    settings.QUERY_BUDGET_RAISE = False
+
+    def count(client, url, method='get', data=None):
+        if method == 'get':
+            client.get(url, data=data or {})
+        cache.clear()
+        response = getattr(client, method)(url, data=data or {})
+        assert hasattr(response.wsgi_request, 'query_stats'), (
+            'Подключите `core.middleware.QueryBudgetMiddleware` '
+            'в `settings.MIDDLEWARE`'
+        )
+        return response.wsgi_request.query_stats.count
+    return count
@@ -0,0 +1,75 @@
+import pytest
+from django.urls import reverse
+
+from posts.urls import app_name, urlpatterns
+
+# Сколько SQL-запросов делает каждая страница posts/urls.py при пустом
+# кэше страниц: имя URL -> (аргументы, клиент, метод, число запросов).
+# Рост числа означает новый N+1 — поправьте код, а не цифру.
+QUERY_PINS = {
+    'index': (lambda post: [], 'guest', 'get', 1),
+    'index_rss': (lambda post: [], 'guest', 'get', 1),
+    'index_atom': (lambda post: [], 'guest', 'get', 1),
+    'group_list': (lambda post: [post.group.slug], 'guest', 'get', 2),
+    'group_rss': (lambda post: [post.group.slug], 'guest', 'get', 2),
+    'group_atom': (lambda post: [post.group.slug], 'guest', 'get', 2),
+    'profile': (lambda post: [post.author.username], 'guest', 'get', 3),
+    'profile_rss': (
+        lambda post: [post.author.username], 'guest', 'get', 2
+    ),
+    'profile_atom': (
+        lambda post: [post.author.username], 'guest', 'get', 2
+    ),
+    # + имя автора для ETag, при пустом кэше
+    'post_detail': (lambda post: [post.pk], 'guest', 'get', 3),
+    'post_comments': (lambda post: [post.pk], 'guest', 'get', 2),
+    'post_create': (lambda post: [], 'user', 'get', 4),
+    'post_edit': (lambda post: [post.pk], 'user', 'get', 5),
+    'add_comment': (lambda post: [post.pk], 'user', 'post', 7),
+    'search': (lambda post: [], 'guest', 'get', 2),
+    'follow_index': (lambda post: [], 'user', 'get', 3),
+    'profile_follow': (lambda post: ['AnotherUser'], 'user', 'get', 5),
+    'profile_unfollow': (lambda post: ['AnotherUser'], 'user', 'get', 6),
+    'api_posts': (lambda post: [], 'guest', 'get', 1),
+    'api_post': (lambda post: [post.pk], 'guest', 'get', 2),
+    'api_comments': (lambda post: [post.pk], 'guest', 'get', 2),
+    'api_groups': (lambda post: [], 'guest', 'get', 1),
+    'api_follow': (lambda post: [], 'user', 'get', 3),
+    # обычного пользователя отправляет на вход в админку; сама выгрузка
+    # читает строки уже после ответа, порциями
+    'export': (lambda post: ['posts'], 'user', 'get', 2),
+}
+
+# параметры GET-запроса для страниц, которым они нужны
+QUERY_PARAMS = {
+    'search': {'q': 'Тестовый пост'},
+}
+
+
+class TestQueryCounts:
+
+    def test_all_urls_pinned(self):
+        names = {pattern.name for pattern in urlpatterns}
+        missing = names - set(QUERY_PINS)
+        assert not missing, (
+            f'Добавьте число запросов для {sorted(missing)} в `QUERY_PINS`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('name', sorted(QUERY_PINS))
+    def test_query_count(self, name, client, user_client, post_with_group,
+                         few_posts_with_group,
+                         another_few_posts_with_group_with_follower,
+                         count_queries):
+        args, client_type, method, expected = QUERY_PINS[name]
+        url = reverse(f'{app_name}:{name}', args=args(post_with_group))
+        data = QUERY_PARAMS.get(name)
+        if method == 'post':
+            data = {'text': 'Комментарий'}
+        if client_type == 'guest':
+            client.logout()
+        queries = count_queries(client, url, method, data)
+        assert queries == expected, (
+            f'Страница `{url}` делает {queries} SQL-запросов '
+            f'вместо {expected}'
+        )
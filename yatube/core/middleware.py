@@ -0,0 +1,145 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import timing
+
+logger = logging.getLogger('yatube.queries')
+perf_logger = logging.getLogger('yatube.perf')
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление сделало больше запросов к БД, чем ему разрешено."""
+
+
+class QueryStats:
+    """Обёртка execute_wrapper: считает запросы и время в базе."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+    def capture(self):
+        """Контекст, в котором считаются запросы ко всем базам."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+def get_budget(view_name):
+    budget = dict(settings.QUERY_BUDGET_DEFAULT)
+    budget.update(settings.QUERY_BUDGETS.get(view_name, {}))
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает SQL-запросы и время в базе за запрос и сверяет их с бюджетом
+    из QUERY_BUDGETS по имени URL. Превышение пишется в лог yatube.queries,
+    а с QUERY_BUDGET_RAISE = True — поднимает QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        with stats.capture():
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None:
+            self.check(match.view_name, request, stats)
+        return response
+
+    def check(self, view_name, request, stats):
+        budget = get_budget(view_name)
+        if (
+            stats.count <= budget['queries']
+            and stats.duration <= budget['time']
+        ):
+            return
+        message = (
+            f'{view_name}: {stats.count} SQL-запросов за '
+            f'{stats.duration * 1000:.1f} мс при бюджете '
+            f'{budget["queries"]} запросов и {budget["time"] * 1000:.0f} мс '
+            f'({request.method} {request.get_full_path()})'
+        )
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ServerTimingMiddleware:
+    """
+    Замеряет выборку запросов (PERF_SAMPLE_RATE): время в базе, попадания
+    в кэш лент, отрисовку шаблонов и миниатюр. Итог уходит в заголовок
+    Server-Timing и одной JSON-строкой в лог yatube.perf.
+    Ставится перед QueryBudgetMiddleware, чтобы взять его query_stats.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PERF_SAMPLE_RATE:
+            return self.get_response(request)
+        timings, token = timing.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        total = time.perf_counter() - started
+        stats = getattr(request, 'query_stats', None) or QueryStats()
+        response['Server-Timing'] = self.header(timings, stats, total)
+        perf_logger.info(json.dumps(
+            self.record(request, response, timings, stats, total),
+            ensure_ascii=False,
+        ))
+        return response
+
+    def header(self, timings, stats, total):
+        metrics = [
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+        ]
+        for name, duration in sorted(timings.durations.items()):
+            metrics.append(f'{name};dur={duration * 1000:.1f}')
+        if timings.counters:
+            counters = ' '.join(
+                f'{name}={value}'
+                for name, value in sorted(timings.counters.items())
+            )
+            metrics.append(f'cache;desc="{counters}"')
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def record(self, request, response, timings, stats, total):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match is not None else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(stats.duration * 1000, 1),
+            'db_queries': stats.count,
+        }
+        for name, duration in timings.durations.items():
+            record[f'{name}_ms'] = round(duration * 1000, 1)
+        record.update(timings.counters)
+        return record
@@ -0,0 +1,43 @@
+import logging
+
+from django import template
+from django.conf import settings
+
+from posts.thumbnails import fallback, queue, renditions
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+def srcset(variants):
+    return ', '.join(f'{url} {width}w' for url, width in variants)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def responsive_image(image, style, css='card-img my-2'):
+    """Выводит <picture> с WebP и JPEG вариантами картинки в srcset."""
+    if not image:
+        return {'image': None}
+    try:
+        variants = renditions(image, style)
+        if variants is None:
+            # варианты ещё не готовы: отдаём самый узкий, остальные
+            # готовит пул и после этого сбрасывает кэш страниц поста
+            queue(image.name)
+            return {'image': image, 'css': css, 'src': fallback(image, style)}
+    except Exception:
+        # как и {% thumbnail %}, ошибки картинки не роняют страницу
+        if settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось получить варианты %s', image)
+        return {'image': None}
+    return {
+        'image': image,
+        'css': css,
+        'sizes': SIZES,
+        'src': variants['JPEG'][-1][0],
+        'webp_srcset': srcset(variants['WEBP']),
+        'jpeg_srcset': srcset(variants['JPEG']),
+    }
@@ -0,0 +1,55 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import QueryBudgetExceeded
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_query_stats_attached(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.wsgi_request.query_stats.count, 1)
+
+    @override_settings(QUERY_BUDGETS={'posts:index': {'queries': 0}})
+    def test_budget_exceeded_logged(self):
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': {'queries': 0}},
+        QUERY_BUDGET_RAISE=True,
+    )
+    def test_budget_exceeded_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_server_timing(self):
+        with self.assertLogs('yatube.perf', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+            cached = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('template;dur=', header)
+        self.assertIn('cache;desc="cache_miss=1"', header)
+        self.assertIn('cache;desc="cache_hit=1"', cached['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 1)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
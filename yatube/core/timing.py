@@ -0,0 +1,69 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Время по участкам и счётчики событий одного запроса."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counters = Counter()
+
+
+def start():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Добавляет время блока к участку name, если запрос замеряется."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += perf_counter() - started
+
+
+def incr(name, amount=1):
+    timings = _current.get()
+    if timings is not None:
+        timings.counters[name] += amount
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates, который замеряет отрисовку шаблонов верхнего уровня:
+    include и extends рисуются внутри них и отдельно не считаются.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
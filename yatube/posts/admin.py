@@ -1,11 +1,62 @@
-from django.contrib import admin
+from functools import lru_cache
 
+from django import forms
+from django.contrib import admin, messages
+from django.forms.utils import flatatt
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from . import search
 from .models import Post, Group, Comment, Follow
+from .paginator import ApproximatePaginator
+
+# сколько совпадений из поискового индекса показывать в админке
+ADMIN_SEARCH_LIMIT = 1000
+
+
+class PlainSelect(forms.Select):
+    """
+    Select, который собирает <option> в Python: шаблон на каждый вариант
+    в сотне строк list_editable рендерится заметно дольше запросов к БД.
+    """
+
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def escape_choices(choices):
+        return [
+            (str(option), conditional_escape(option),
+             conditional_escape(label))
+            for option, label in choices
+        ]
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, dict(attrs or {}, name=name))
+        value = '' if value is None else str(value)
+        options = ''.join(
+            '<option value="{}"{}>{}</option>'.format(
+                option, ' selected' if raw == value else '', label
+            )
+            for raw, option, label in self.escape_choices(tuple(self.choices))
+        )
+        return format_html(
+            '<select{}>{}</select>', flatatt(attrs), mark_safe(options)
+        )
 
 
-class PostAdmin(admin.ModelAdmin):
+class ApproximateCountMixin:
+    # число записей в списке — оценка планировщика на больших таблицах,
+    # и без второго COUNT(*) по всей таблице при фильтрации
+    paginator = ApproximatePaginator
+    show_full_result_count = False
+
+
+class PostAdmin(ApproximateCountMixin, admin.ModelAdmin):
     # Поля
-    list_display = ('pk', 'text', 'created', 'author', 'group', 'video')
+    list_display = (
+        'pk', 'text', 'created', 'author', 'group', 'video', 'comments',
+    )
+    # автор и группа приходят одним запросом со страницей постов
+    list_select_related = ('author', 'group')
     # поиск по тексту постов
     search_fields = ('text',)
     # фильтрация по дате
@@ -13,6 +64,43 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def comments(self, post):
+        # готовый счётчик из posts.counters, без COUNT на каждую строку
+        return post.comments_count
+    comments.short_description = 'Комментарии'
+    comments.admin_order_field = 'comments_count'
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = PlainSelect
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == 'group':
+            # список групп для list_editable выбирается один раз на запрос,
+            # а не заново в виджете каждой строки
+            choices = getattr(request, '_group_choices', None)
+            if choices is None:
+                choices = request._group_choices = list(formfield.choices)
+            formfield.choices = choices
+        return formfield
+
+    def get_search_results(self, request, queryset, search_term):
+        # вместо ILIKE по всей таблице — полнотекстовый индекс
+        if not search_term:
+            return queryset, False
+        # список id уходит в IN (...), поэтому он ограничен, но об
+        # обрезке админ узнаёт, а не теряет совпадения молча
+        found = search.find(search_term, limit=ADMIN_SEARCH_LIMIT + 1)
+        if len(found) > ADMIN_SEARCH_LIMIT:
+            found = found[:ADMIN_SEARCH_LIMIT]
+            messages.warning(
+                request,
+                f'Показаны первые {ADMIN_SEARCH_LIMIT} совпадений '
+                f'по релевантности, уточните запрос',
+            )
+        return queryset.filter(pk__in=[pk for pk, _ in found]), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
@@ -20,8 +108,9 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ApproximateCountMixin, admin.ModelAdmin):
     list_display = ('pk', 'post', 'author', 'text', 'created', 'comment_video')
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
     list_filter = ('created',)
     list_editable = ('text',)
@@ -0,0 +1,275 @@
+"""
+JSON API для мобильного клиента, только чтение: посты, группы,
+комментарии и лента подписок. Выборки те же, что у HTML-страниц,
+списки листаются курсором, ответы кэшируются по областям posts.cache
+и поддерживают 304 Not Modified.
+
+Параметр fields (например, ?fields=id,text,author) оставляет в ответе
+только перечисленные поля и не читает из базы лишние колонки.
+"""
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from .cache import (cache_feed, follow_scope, group_scope, index_scope,
+                    page_etag, post_scope, profile_scope)
+from .models import Group, Post, TimelineEntry
+from .paginator import (MAX_ID, CursorPaginator, comments_page,
+                        decode_cursor)
+
+JSON_OPTIONS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+# поле ответа -> поля модели, которые для него нужно прочитать
+POST_FIELDS = {
+    'id': ('id',),
+    'text': ('text',),
+    'created': ('created',),
+    'author': ('author', 'author__username'),
+    'group': ('group', 'group__slug'),
+    'image': ('image',),
+    'video': ('video_embed_url',),
+    'comments_count': ('comments_count',),
+}
+COMMENT_FIELDS = {
+    'id': ('id',),
+    'post': ('post',),
+    'author': ('author', 'author__username'),
+    'text': ('text',),
+    'created': ('created',),
+    'video': ('comment_video_embed_url',),
+}
+GROUP_FIELDS = {
+    'id': ('id',),
+    'slug': ('slug',),
+    'title': ('title',),
+    'description': ('description',),
+}
+
+
+def post_data(post):
+    return {
+        'id': lambda: post.id,
+        'text': lambda: post.text,
+        'created': lambda: post.created.isoformat(),
+        'author': lambda: post.author.username,
+        'group': lambda: post.group.slug if post.group_id else None,
+        'image': lambda: post.image.url if post.image else None,
+        'video': lambda: post.video_embed_url or None,
+        'comments_count': lambda: post.comments_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': lambda: comment.id,
+        'post': lambda: comment.post_id,
+        'author': lambda: comment.author.username,
+        'text': lambda: comment.text,
+        'created': lambda: comment.created.isoformat(),
+        'video': lambda: comment.comment_video_embed_url or None,
+    }
+
+
+def group_data(group):
+    return {
+        'id': lambda: group.id,
+        'slug': lambda: group.slug,
+        'title': lambda: group.title,
+        'description': lambda: group.description,
+    }
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def requested_fields(request, known):
+    """Поля из ?fields= в порядке known; без параметра — все."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(known)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = sorted(set(fields) - set(known))
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return [name for name in known if name in fields]
+
+
+def requested_cursor(request):
+    """Курсор из ?cursor=; битый — ошибка, а не молча первая страница."""
+    cursor = request.GET.get('cursor')
+    if cursor and decode_cursor(cursor) is None:
+        raise ApiError('Неверный курсор')
+    return cursor
+
+
+def columns(known, fields, prefix='', required=('id', 'created')):
+    """Колонки для QuerySet.only(): нужные полям ответа и курсору."""
+    names = set(required)
+    for name in fields:
+        names.update(known[name])
+    return [prefix + name for name in sorted(names)]
+
+
+def related(fields, prefix=''):
+    """Связи для select_related: только те, что попали в ответ."""
+    return [prefix + name for name in ('author', 'group') if name in fields]
+
+
+def serialize(getters, fields):
+    return {name: getters[name]() for name in fields}
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def page_response(request, page, make_data, fields):
+    return JsonResponse({
+        'results': [serialize(make_data(obj), fields) for obj in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }, json_dumps_params=JSON_OPTIONS)
+
+
+def api_view(scopes):
+    """
+    GET/HEAD-представление API: кэш ответа и ETag по областям scopes,
+    ошибки — JSON с полем detail вместо HTML-страницы.
+    """
+    def decorator(view):
+        cached = condition(etag_func=page_etag(scopes))(
+            cache_feed(scopes, name='api')(view)
+        )
+
+        @require_safe
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return cached(request, *args, **kwargs)
+            except Http404:
+                error = ApiError('Не найдено', status=404)
+            except ApiError as raised:
+                error = raised
+            return JsonResponse(
+                {'detail': error.detail},
+                status=error.status,
+                json_dumps_params=JSON_OPTIONS,
+            )
+        return wrapper
+    return decorator
+
+
+def posts_scope(request):
+    # те же области, что у главной, страницы группы и профиля
+    if request.GET.get('group'):
+        return group_scope(request, request.GET['group'])
+    if request.GET.get('author'):
+        return profile_scope(request, request.GET['author'])
+    return index_scope(request)
+
+
+def groups_scope(request):
+    return ['groups']
+
+
+def comments_scope(request, post_id):
+    return [f'post:{post_id}']
+
+
+def login_scope(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Требуется вход', status=401)
+    return follow_scope(request)
+
+
+@api_view(posts_scope)
+def posts(request):
+    fields = requested_fields(request, POST_FIELDS)
+    queryset = Post.objects.select_related(*related(fields))
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    elif request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    queryset = queryset.only(*columns(POST_FIELDS, fields))
+    page = CursorPaginator(queryset, settings.POST_AMOUNT).cursor_page(
+        requested_cursor(request)
+    )
+    return page_response(request, page, post_data, fields)
+
+
+@api_view(post_scope)
+def post(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    post = get_object_or_404(
+        Post.objects.select_related(*related(fields)).only(
+            *columns(POST_FIELDS, fields)
+        ),
+        id=post_id,
+    )
+    return JsonResponse(
+        serialize(post_data(post), fields), json_dumps_params=JSON_OPTIONS
+    )
+
+
+@api_view(comments_scope)
+def comments(request, post_id):
+    fields = requested_fields(request, COMMENT_FIELDS)
+    requested_cursor(request)
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    page = comments_page(
+        request, post, columns(COMMENT_FIELDS, fields, required=(
+            # comments_page всегда подтягивает авторов
+            'id', 'created', 'post', 'author', 'author__username',
+        ))
+    )
+    return page_response(request, page, comment_data, fields)
+
+
+@api_view(groups_scope)
+def groups(request):
+    fields = requested_fields(request, GROUP_FIELDS)
+    queryset = Group.objects.order_by('id').only(
+        *columns(GROUP_FIELDS, fields, required=('id',))
+    )
+    # групп немного и у них нет даты: курсор — просто последний id
+    after = request.GET.get('cursor')
+    if after:
+        # isdigit() пропустил бы и '²', на котором падает int()
+        if not re.fullmatch(r'[0-9]+', after) or int(after) > MAX_ID:
+            raise ApiError('Неверный курсор')
+        queryset = queryset.filter(id__gt=int(after))
+    rows = list(queryset[:settings.API_GROUPS_PER_PAGE + 1])
+    has_next = len(rows) > settings.API_GROUPS_PER_PAGE
+    rows = rows[:settings.API_GROUPS_PER_PAGE]
+    return JsonResponse({
+        'results': [serialize(group_data(group), fields) for group in rows],
+        'next': page_url(request, str(rows[-1].id) if has_next else None),
+        'previous': None,
+    }, json_dumps_params=JSON_OPTIONS)
+
+
+@api_view(login_scope)
+def follow(request):
+    fields = requested_fields(request, POST_FIELDS)
+    entries = TimelineEntry.objects.filter(
+        user=request.user
+    ).select_related('post', *related(fields, prefix='post__')).only(
+        'created', 'post', *columns(POST_FIELDS, fields, prefix='post__')
+    )
+    page = CursorPaginator(
+        entries, settings.POST_AMOUNT, keys=('created', 'post_id')
+    ).cursor_page(requested_cursor(request))
+    page.object_list = [entry.post for entry in page.object_list]
+    return page_response(request, page, post_data, fields)
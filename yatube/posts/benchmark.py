@@ -0,0 +1,271 @@
+"""
+Нагрузочный прогон страниц постов прямо через WSGI-приложение
+yatube/wsgi.py: без сервера и сети, с несколькими потоками-пользователями.
+"""
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from io import BytesIO
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import reverse
+
+from core.middleware import QueryStats
+
+from .models import Follow, Group, Post, User
+
+# адрес не из INTERNAL_IPS, чтобы не подключался debug_toolbar
+REMOTE_ADDR = '203.0.113.10'
+PERCENTILES = (50, 95, 99)
+
+
+def sample(queryset, size, rng):
+    """Случайные строки без ORDER BY RANDOM(): по случайным id из диапазона."""
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    ids = {
+        rng.randint(bounds['low'], bounds['high']) for _ in range(size * 2)
+    }
+    return list(queryset.filter(pk__in=ids)[:size])
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу; values отсортированы."""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(share / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Fixtures:
+    """Что запрашивать: выборка постов, групп и авторов из базы."""
+
+    def __init__(self, rng, size=500):
+        self.posts = sample(Post.objects.only('pk'), size, rng)
+        self.groups = sample(Group.objects.only('slug'), size, rng)
+        self.authors = sample(User.objects.only('username'), size, rng)
+        # подписчики, чтобы лента подписок не была пустой
+        self.readers = list(User.objects.filter(
+            pk__in=Follow.objects.values('user_id')[:size]
+        ))
+        if not self.posts or not self.readers:
+            raise ValueError(
+                'В базе нет постов или подписок: сначала выполните seed_data'
+            )
+
+
+class VirtualUser:
+    """Пользователь со своими cookie, который ходит по сценариям."""
+
+    def __init__(self, app, user=None):
+        self.app = app
+        self.cookies = {}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            self.cookies = {
+                name: morsel.value for name, morsel in client.cookies.items()
+            }
+
+    @property
+    def is_authenticated(self):
+        return 'sessionid' in self.cookies
+
+    def request(self, method, path, data=None):
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'REMOTE_ADDR': REMOTE_ADDR,
+            'HTTP_HOST': 'testserver',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+        }
+        if self.cookies:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        if method == 'POST':
+            environ['HTTP_X_CSRFTOKEN'] = self.cookies.get('csrftoken', '')
+            environ['HTTP_REFERER'] = 'http://testserver/'
+        setup_testing_defaults(environ)
+        status = []
+
+        def start_response(line, headers, exc_info=None):
+            status.append(int(line.split()[0]))
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    cookie = SimpleCookie(value)
+                    self.cookies.update(
+                        (key, morsel.value) for key, morsel in cookie.items()
+                    )
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        with stats.capture():
+            response = self.app(environ, start_response)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                # close() шлёт request_finished и закрывает соединение с БД
+                response.close()
+        return status[0], time.perf_counter() - started, stats.count
+
+
+def index(user, fixtures, rng):
+    return 'GET', reverse('posts:index'), None
+
+
+def group_list(user, fixtures, rng):
+    group = rng.choice(fixtures.groups)
+    return 'GET', reverse('posts:group_list', args=[group.slug]), None
+
+
+def profile(user, fixtures, rng):
+    author = rng.choice(fixtures.authors)
+    return 'GET', reverse('posts:profile', args=[author.username]), None
+
+
+def post_detail(user, fixtures, rng):
+    post = rng.choice(fixtures.posts)
+    return 'GET', reverse('posts:post_detail', args=[post.pk]), None
+
+
+def follow_index(user, fixtures, rng):
+    return 'GET', reverse('posts:follow_index'), None
+
+
+def post_create(user, fixtures, rng):
+    # форма выдаёт cookie csrftoken, как в браузере
+    user.request('GET', reverse('posts:post_create'))
+    data = {'text': f'Нагрузочный пост {rng.random()}'}
+    if fixtures.groups:
+        data['group'] = rng.choice(fixtures.groups).pk
+    return 'POST', reverse('posts:post_create'), data
+
+
+def add_comment(user, fixtures, rng):
+    post = rng.choice(fixtures.posts)
+    user.request('GET', reverse('posts:post_detail', args=[post.pk]))
+    data = {'text': f'Нагрузочный комментарий {rng.random()}'}
+    return 'POST', reverse('posts:add_comment', args=[post.pk]), data
+
+
+# сценарий: (доля трафика, нужен ли вход)
+SCENARIOS = {
+    index: (30, False),
+    group_list: (15, False),
+    profile: (15, False),
+    post_detail: (25, False),
+    follow_index: (10, True),
+    post_create: (2, True),
+    add_comment: (3, True),
+}
+
+
+def pick_scenario(user, rng):
+    scenarios = [
+        (scenario, weight)
+        for scenario, (weight, needs_login) in SCENARIOS.items()
+        if user.is_authenticated or not needs_login
+    ]
+    return rng.choices(
+        [scenario for scenario, _ in scenarios],
+        weights=[weight for _, weight in scenarios],
+    )[0]
+
+
+def run(app, concurrency=8, duration=30, warmup=2, guest_share=0.5,
+        seed=None):
+    """
+    Гоняет сценарии в concurrency потоках duration секунд после прогрева
+    и возвращает сводку: перцентили задержки, пропускную способность
+    и число SQL-запросов по каждому сценарию.
+    """
+    rng = random.Random(seed)
+    fixtures = Fixtures(rng)
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def worker(number):
+        worker_rng = random.Random(rng.random())
+        reader = None
+        if worker_rng.random() >= guest_share:
+            reader = fixtures.readers[number % len(fixtures.readers)]
+        user = VirtualUser(app, reader)
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            scenario = pick_scenario(user, worker_rng)
+            method, path, data = scenario(user, fixtures, worker_rng)
+            try:
+                status, elapsed, queries = user.request(method, path, data)
+            except Exception:
+                status, elapsed, queries = 500, 0.0, 0
+            if now >= measure_from:
+                with lock:
+                    samples[scenario.__name__].append(
+                        (status, elapsed, queries)
+                    )
+
+    threads = [
+        threading.Thread(target=worker, args=(number,))
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, duration, {
+        'concurrency': concurrency,
+        'duration': duration,
+        'warmup': warmup,
+        'guest_share': guest_share,
+        'seed': seed,
+    })
+
+
+def summarize(samples, duration, options):
+    scenarios = {}
+    everything = []
+    for name, rows in sorted(samples.items()):
+        everything.extend(rows)
+        scenarios[name] = describe(rows, duration)
+    return {
+        'options': options,
+        'total': describe(everything, duration),
+        'scenarios': scenarios,
+    }
+
+
+def describe(rows, duration):
+    latencies = sorted(elapsed * 1000 for _, elapsed, _ in rows)
+    queries = [count for _, _, count in rows]
+    result = {
+        'requests': len(rows),
+        'errors': sum(1 for status, _, _ in rows if status >= 500),
+        'throughput_rps': round(len(rows) / duration, 2) if duration else None,
+        'queries_mean': (
+            round(sum(queries) / len(queries), 2) if queries else None
+        ),
+        'queries_max': max(queries, default=None),
+    }
+    for share in PERCENTILES:
+        value = percentile(latencies, share)
+        result[f'p{share}_ms'] = round(value, 2) if value is not None else None
+    return result
@@ -0,0 +1,223 @@
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import timing
+
+from .models import Post
+
+VERSION_KEY = 'posts:version:{}'
+# версии заводятся и для несуществующих групп и профилей: ETag
+# считается до get_object_or_404, поэтому ключи не вечные
+VERSION_TIMEOUT = 24 * 60 * 60
+PAGE_KEY = 'posts:page:{versions}:{user}:{path}'
+LOCK_KEY = '{}:lock'
+# автор поста не меняется, но имя пользователя могут поправить в админке
+AUTHOR_KEY = 'posts:author:{}'
+AUTHOR_TIMEOUT = 60 * 60
+# сколько ждёт запрос без кэша, пока страницу собирает другой запрос
+LOCK_WAIT = 0.05
+LOCK_ATTEMPTS = 20
+
+
+def index_scope(request):
+    return ['index']
+
+
+def group_scope(request, slug):
+    return [f'group:{slug}']
+
+
+def profile_scope(request, username):
+    return [f'profile:{username}']
+
+
+def follow_scope(request):
+    return [f'follow:{request.user.pk}']
+
+
+def post_scope(request, post_id):
+    # на странице поста есть и число постов автора, поэтому нужна
+    # область его профиля; None — поста нет, сверять нечего
+    key = AUTHOR_KEY.format(post_id)
+    username = cache.get(key)
+    if username is None:
+        username = Post.objects.filter(pk=post_id).values_list(
+            'author__username', flat=True
+        ).first()
+        if username is None:
+            return None
+        cache.set(key, username, AUTHOR_TIMEOUT)
+    return [f'post:{post_id}', f'profile:{username}']
+
+
+def get_versions(scopes):
+    """Возвращает текущие версии областей, заводя недостающие."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # стартуем со времени, а не с единицы: если ключ версии
+            # вытеснили из кэша, старые страницы не всплывут снова
+            cache.add(key, int(time.time() * 1000), VERSION_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает устаревшими все страницы, закэшированные для областей."""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), VERSION_TIMEOUT)
+
+
+def set_card_versions(page_obj):
+    """
+    Проставляет постам страницы card_version для кэша карточек
+    в posts/includes/post_list.html: одна выборка версий на всю страницу.
+    В карточке есть ссылка на группу, поэтому в версию входит и версия
+    группы: после её правки или удаления карточка собирается заново.
+    """
+    page_obj.object_list = list(page_obj.object_list)
+    scopes = [f'post:{post.pk}' for post in page_obj]
+    groups = sorted({post.group.slug for post in page_obj if post.group_id})
+    versions = get_versions(scopes + [f'group:{slug}' for slug in groups])
+    group_versions = dict(zip(groups, versions[len(scopes):]))
+    for post, version in zip(page_obj, versions):
+        if post.group_id:
+            version = f'{version}.{group_versions[post.group.slug]}'
+        post.card_version = version
+
+
+def page_key(request, scopes):
+    versions = '.'.join(str(version) for version in get_versions(scopes))
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(
+        versions=versions,
+        user=request.user.pk or 'anon',
+        path=path,
+    )
+
+
+def page_etag(scopes, csrf=False):
+    """
+    etag_func для django.views.decorators.http.condition: ETag страницы
+    складывается из тех же версий областей, что и ключ cache_feed, так что
+    304 Not Modified отдаётся без пагинации и шаблонов, по одному
+    обращению к кэшу.
+
+    csrf=True — для страниц с формой: токен меняется при входе, и по 304
+    браузер оставил бы себе форму со старым токеном.
+    """
+    def etag(request, *args, **kwargs):
+        page_scopes = scopes(request, *args, **kwargs)
+        if page_scopes is None:
+            return None
+        key = page_key(request, page_scopes)
+        if csrf:
+            key += ':' + request.META.get('CSRF_COOKIE', '')
+        return hashlib.md5(key.encode()).hexdigest()
+    return etag
+
+
+def feed_settings(name):
+    """Настройки кэша ленты: FEED_CACHE[name] поверх общих значений."""
+    options = {
+        'timeout': settings.CACHE_TIME,
+        'stale': settings.CACHE_STALE_TIME,
+        'beta': settings.CACHE_EARLY_BETA,
+    }
+    options.update(settings.FEED_CACHE.get(name, {}))
+    return options
+
+
+def is_expired(entry, beta):
+    """
+    Вероятностное досрочное истечение (XFetch): чем ближе срок и чем
+    дольше собиралась страница, тем вероятнее пересборка до истечения.
+    """
+    _, expires, delta = entry
+    jitter = -delta * beta * math.log(1 - random.random())
+    return time.time() + jitter >= expires
+
+
+def rebuild(key, view, options, request, *args, **kwargs):
+    started = time.time()
+    response = view(request, *args, **kwargs)
+    if (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    ):
+        delta = time.time() - started
+        cache.set(
+            key,
+            (response, time.time() + options['timeout'], delta),
+            options['timeout'] + options['stale'],
+        )
+    return response
+
+
+def rebuild_once(key, entry, view, options, request, *args, **kwargs):
+    """
+    Пересобирает страницу под блокировкой; пока её держит другой запрос,
+    отдаёт устаревшую копию entry или ждёт, когда появится свежая.
+    """
+    lock = LOCK_KEY.format(key)
+    for _ in range(LOCK_ATTEMPTS):
+        if cache.add(lock, 1, options['timeout']):
+            timing.incr('cache_miss')
+            try:
+                return rebuild(key, view, options, request, *args, **kwargs)
+            finally:
+                cache.delete(lock)
+        if entry is not None:
+            timing.incr('cache_stale')
+            return entry[0]
+        time.sleep(LOCK_WAIT)
+        entry = cache.get(key)
+        if entry is not None:
+            timing.incr('cache_hit')
+            return entry[0]
+    # блокировку так и не отпустили: собираем без кэша
+    timing.incr('cache_miss')
+    return view(request, *args, **kwargs)
+
+
+def cache_feed(scopes, name=None):
+    """
+    Кэширует GET-ответ представления под ключом, в который входят версии
+    областей scopes(request, *args, **kwargs). Вместо cache.clear() при
+    изменениях достаточно вызвать bump() для затронутых областей.
+
+    Страницу пересобирает только тот запрос, который взял блокировку;
+    остальные в это время получают устаревшую копию или ждут первую.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            page_scopes = scopes(request, *args, **kwargs)
+            if page_scopes is None:
+                # страницы нет (например, пост удалён): кэшировать нечего
+                return view(request, *args, **kwargs)
+            options = feed_settings(name or view.__name__)
+            key = page_key(request, page_scopes)
+            entry = cache.get(key)
+            if entry is not None and not is_expired(entry, options['beta']):
+                timing.incr('cache_hit')
+                return entry[0]
+            return rebuild_once(
+                key, entry, view, options, request, *args, **kwargs
+            )
+        return wrapper
+    return decorator
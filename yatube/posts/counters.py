@@ -0,0 +1,102 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Post, User, UserStats
+
+
+def _apply(queryset, deltas):
+    return queryset.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def change_user(user_id, **deltas):
+    """
+    Сдвигает счётчики пользователя: change_user(pk, posts_count=1).
+    Если строки нет, её потом целиком пересчитает user_stats().
+    """
+    _apply(UserStats.objects.filter(user_id=user_id), deltas)
+
+
+def change_post(post_id, delta):
+    _apply(Post.objects.filter(pk=post_id), {'comments_count': delta})
+
+
+def user_counts(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def recount_user(user_id):
+    counts = user_counts(user_id)
+    try:
+        with transaction.atomic():
+            stats, _ = UserStats.objects.update_or_create(
+                user_id=user_id, defaults=counts
+            )
+    except IntegrityError:
+        # строку одновременно создал другой запрос
+        stats = UserStats.objects.get(user_id=user_id)
+    return stats
+
+
+def user_stats(user):
+    """Счётчики пользователя; недостающая строка создаётся пересчётом."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def count_by_user(queryset, field):
+    """
+    Подзапрос COUNT(*) по пользователю. Три JOIN с COUNT(DISTINCT)
+    перемножают строки популярных авторов, подзапросы этого не делают.
+    """
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), 0)
+
+
+def reconcile(batch_size=500):
+    """
+    Сверяет счётчики с таблицами и исправляет расхождения.
+    Возвращает количество исправленных строк.
+    """
+    fixed = 0
+    missing = []
+    users = User.objects.annotate(
+        real_posts=count_by_user(Post.objects, 'author'),
+        real_followers=count_by_user(Follow.objects, 'author'),
+        real_following=count_by_user(Follow.objects, 'user'),
+    ).select_related('stats').order_by('pk')
+    for user in users.iterator(chunk_size=batch_size):
+        counts = {
+            'posts_count': user.real_posts,
+            'followers_count': user.real_followers,
+            'following_count': user.real_following,
+        }
+        stats = getattr(user, 'stats', None)
+        if stats is None:
+            missing.append(UserStats(user=user, **counts))
+            fixed += 1
+        elif any(getattr(stats, f) != v for f, v in counts.items()):
+            UserStats.objects.filter(user=user).update(**counts)
+            fixed += 1
+    UserStats.objects.bulk_create(missing, ignore_conflicts=True)
+    posts = Post.objects.annotate(
+        real_comments=Count('comments')
+    ).exclude(comments_count=F('real_comments')).values_list(
+        'pk', 'real_comments'
+    )
+    batch = []
+    for pk, real_comments in posts.iterator(chunk_size=batch_size):
+        batch.append(Post(pk=pk, comments_count=real_comments))
+        fixed += 1
+    Post.objects.bulk_update(batch, ['comments_count'], batch_size=batch_size)
+    return fixed
@@ -0,0 +1,145 @@
+"""
+Потоковая выгрузка постов, комментариев и подписок в NDJSON или CSV.
+Строки читаются из базы порциями через QuerySet.iterator() (в PostgreSQL
+это серверный курсор), поэтому память не зависит от размера таблиц.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Post
+
+# что выгружается: колонки (имя -> поле) и поля для фильтров
+EXPORTS = {
+    'posts': {
+        'queryset': Post.objects.all(),
+        'columns': {
+            'id': 'id',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'text': 'text',
+            'created': 'created',
+            'image': 'image',
+            'video': 'video',
+        },
+        'date': 'created',
+        'group': 'group__slug',
+        'author': 'author__username',
+    },
+    'comments': {
+        'queryset': Comment.objects.all(),
+        'columns': {
+            'id': 'id',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'created': 'created',
+            'video': 'comment_video',
+        },
+        'date': 'created',
+        'group': 'post__group__slug',
+        'author': 'author__username',
+    },
+    'follows': {
+        'queryset': Follow.objects.all(),
+        'columns': {
+            'id': 'id',
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+        'date': None,
+        'group': None,
+        'author': 'author__username',
+    },
+}
+
+
+def parse_moment(value, end=False):
+    """
+    Дата или дата со временем из строки. Для голой даты берётся начало
+    дня, а с end=True — начало следующего: граница «по» включает весь день.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Неверная дата: {value}')
+        if end:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def queryset(kind, since=None, until=None, group=None, author=None):
+    export = EXPORTS[kind]
+    filters = {}
+    if since or until:
+        if export['date'] is None:
+            raise ValueError(f'У {kind} нет даты для фильтра')
+        if since:
+            filters[f'{export["date"]}__gte'] = parse_moment(since)
+        if until:
+            filters[f'{export["date"]}__lt'] = parse_moment(until, end=True)
+    if group:
+        if export['group'] is None:
+            raise ValueError(f'У {kind} нет группы для фильтра')
+        filters[export['group']] = group
+    if author:
+        filters[export['author']] = author
+    return export['queryset'].filter(**filters).order_by('pk')
+
+
+def rows(kind, chunk_size=None, **filters):
+    """
+    Словари строк выгрузки по одной, без загрузки таблицы в память.
+    Ошибки фильтров (ValueError) возникают сразу, до первой строки.
+    """
+    names = list(EXPORTS[kind]['columns'])
+    values = queryset(kind, **filters).values_list(
+        *EXPORTS[kind]['columns'].values()
+    ).iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+    return (record(names, row) for row in values)
+
+
+def record(names, row):
+    return {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in zip(names, row)
+    }
+
+
+def to_ndjson(kind, records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def to_csv(kind, records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORTS[kind]['columns'])
+    for record in records:
+        yield writer.writerow(record.values())
+
+
+# формат -> (Content-Type, функция вывода)
+FORMATS = {
+    'ndjson': ('application/x-ndjson', to_ndjson),
+    'csv': ('text/csv', to_csv),
+}
+
+
+def stream(kind, output_format, records):
+    """Строки файла выгрузки в формате output_format."""
+    return FORMATS[output_format][1](kind, records)
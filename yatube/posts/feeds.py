@@ -0,0 +1,118 @@
+"""
+RSS и Atom для общей ленты, групп и авторов. Читатели опрашивают их
+вместо HTML-страниц: в ленте только последние FEED_ITEMS постов, ответ
+кэшируется по тем же областям, что и страницы, и поддерживает 304.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from .cache import (cache_feed, group_scope, index_scope, page_etag,
+                    profile_scope)
+from .models import Group, Post, User
+
+
+class PostsFeed(Feed):
+    def items(self, obj=None):
+        return self.posts(obj).select_related('author', 'group')[
+            :settings.FEED_ITEMS
+        ]
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def item_title(self, item):
+        return Truncator(item.text).words(10)
+
+    def item_description(self, item):
+        # описание читается как HTML: текст поста экранируем
+        return linebreaks(item.text, autoescape=True)
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.created
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group_id else []
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def posts(self, group):
+        return group.posts.all()
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def posts(self, author):
+        return author.posts.all()
+
+    def title(self, author):
+        return f'Yatube: записи {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Новые записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorFeed.description
+
+
+def cached(feed, scopes):
+    # ETag и кэш ответа — по тем же областям, что и у HTML-страниц
+    return condition(etag_func=page_etag(scopes))(
+        cache_feed(scopes, name='feeds')(feed)
+    )
+
+
+index_rss = cached(IndexFeed(), index_scope)
+index_atom = cached(IndexAtomFeed(), index_scope)
+group_rss = cached(GroupFeed(), group_scope)
+group_atom = cached(GroupAtomFeed(), group_scope)
+profile_rss = cached(AuthorFeed(), profile_scope)
+profile_atom = cached(AuthorAtomFeed(), profile_scope)
@@ -0,0 +1,44 @@
+from django.core.files.images import get_image_dimensions
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры и ориентацию картинок у старых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов обновлять одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        ).only('id', 'image')
+        batch, updated, missing = [], 0, 0
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            try:
+                with post.image.open('rb') as image:
+                    post.set_image_dimensions(*get_image_dimensions(image))
+            except (OSError, ValueError):
+                missing += 1
+                continue
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                updated += self.flush(batch)
+        updated += self.flush(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {updated}, файлов не найдено: {missing}'
+        ))
+
+    def flush(self, batch):
+        Post.objects.bulk_update(
+            batch, ['image_width', 'image_height', 'image_orientation']
+        )
+        count = len(batch)
+        batch.clear()
+        return count
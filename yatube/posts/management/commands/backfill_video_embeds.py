@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Post
+from posts.video import embed_url
+
+# модель, поле со ссылкой, поле с адресом для iframe
+EMBED_FIELDS = (
+    (Post, 'video', 'video_embed_url'),
+    (Comment, 'comment_video', 'comment_video_embed_url'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет адреса встраиваемых видео у постов и комментариев, '
+        'добавленных без save(), например командой import_data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько строк обновлять одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        for model, source, target in EMBED_FIELDS:
+            rows = model.objects.exclude(**{source: ''}).exclude(
+                **{f'{source}__isnull': True}
+            ).filter(**{target: ''}).only('pk', source)
+            batch, updated = [], 0
+            for obj in rows.iterator(chunk_size=options['batch_size']):
+                url = embed_url(getattr(obj, source))
+                if not url:
+                    continue
+                setattr(obj, target, url)
+                batch.append(obj)
+                if len(batch) >= options['batch_size']:
+                    updated += self.flush(model, batch, target)
+            updated += self.flush(model, batch, target)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model.__name__}: заполнено адресов видео {updated}'
+            ))
+
+    def flush(self, model, batch, target):
+        model.objects.bulk_update(batch, [target])
+        count = len(batch)
+        batch.clear()
+        return count
@@ -0,0 +1,104 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон страниц постов через yatube/wsgi.py на '
+        'локальной базе (заполните её seed_data); результат пишется в JSON. '
+        'post_create и add_comment пишут в базу — берите тестовую копию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Сколько секунд замерять после прогрева',
+        )
+        parser.add_argument('--warmup', type=float, default=2)
+        parser.add_argument(
+            '--guest-share',
+            type=float,
+            default=0.5,
+            help='Доля пользователей без входа',
+        )
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--output',
+            help='Куда сохранить JSON (по умолчанию benchmark-<время>.json)',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона для сравнения задержек',
+        )
+
+    def handle(self, *args, **options):
+        from yatube.wsgi import application
+
+        try:
+            result = benchmark.run(
+                application,
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                warmup=options['warmup'],
+                guest_share=options['guest_share'],
+                seed=options['seed'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        result['meta'] = {
+            'finished': timezone.now().isoformat(),
+            'commit': self.commit(),
+            'debug': settings.DEBUG,
+            'database': settings.DATABASES['default']['ENGINE'],
+        }
+        output = options['output'] or 'benchmark-{}.json'.format(
+            timezone.now().strftime('%Y%m%d-%H%M%S')
+        )
+        with open(output, 'w') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)
+        self.report(result, previous)
+        self.stdout.write(self.style.SUCCESS(f'Результат: {output}'))
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, result, previous=None):
+        rows = dict(result['scenarios'], total=result['total'])
+        old_rows = {}
+        if previous:
+            old_rows = dict(previous['scenarios'], total=previous['total'])
+        self.stdout.write(
+            f'{"сценарий":<14}{"запросы":>9}{"ошибки":>8}{"rps":>9}'
+            f'{"p50":>9}{"p95":>9}{"p99":>9}{"SQL":>7}'
+        )
+        for name, row in rows.items():
+            line = (
+                f'{name:<14}{row["requests"]:>9}{row["errors"]:>8}'
+                f'{row["throughput_rps"] or 0:>9.1f}'
+                f'{row["p50_ms"] or 0:>9.1f}{row["p95_ms"] or 0:>9.1f}'
+                f'{row["p99_ms"] or 0:>9.1f}{row["queries_mean"] or 0:>7.1f}'
+            )
+            old = old_rows.get(name)
+            if old and old.get('p95_ms') and row['p95_ms']:
+                change = (row['p95_ms'] / old['p95_ms'] - 1) * 100
+                line += f'   p95 {change:+.0f}%'
+            self.stdout.write(line)
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии или подписки в NDJSON или '
+        'CSV; память не растёт с размером таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(export.EXPORTS))
+        parser.add_argument(
+            '--format',
+            choices=list(export.FORMATS),
+            default='ndjson',
+            help='Формат вывода',
+        )
+        parser.add_argument(
+            '--since', help='Начиная с даты (YYYY-MM-DD или ISO 8601)'
+        )
+        parser.add_argument(
+            '--until', help='По дату включительно (YYYY-MM-DD или ISO 8601)'
+        )
+        parser.add_argument('--group', help='Slug группы')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Сколько строк читать из базы за раз',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки (по умолчанию stdout)'
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        try:
+            records = export.rows(
+                kind,
+                chunk_size=options['chunk_size'],
+                since=options['since'],
+                until=options['until'],
+                group=options['group'],
+                author=options['author'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        started = time.monotonic()
+        count = 0
+
+        def counted():
+            nonlocal count
+            for record in records:
+                count += 1
+                yield record
+
+        lines = export.stream(kind, options['format'], counted())
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Выгружено {kind}: {count} за {elapsed:.1f} с '
+            f'({count / elapsed if elapsed else 0:.0f} строк/с)'
+        )
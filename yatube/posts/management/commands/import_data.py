@@ -0,0 +1,320 @@
+import csv
+import itertools
+import json
+import sys
+import time
+from contextlib import nullcontext
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts import cache, export, search
+from posts.models import Comment, Follow, Group, ImportedId, Post, User
+
+from .seed_data import explicit_created
+
+# сколько значений передавать в одном IN (...): у SQLite лимит параметров
+IN_CHUNK = 500
+
+# что пересчитать после вставки: bulk_create не шлёт сигналов
+DERIVED = {
+    'posts': (
+        'reconcile_counters', 'rebuild_timelines', 'rebuild_search_index',
+        'backfill_video_embeds', 'backfill_image_dimensions',
+    ),
+    'comments': (
+        'reconcile_counters', 'rebuild_search_index', 'backfill_video_embeds',
+    ),
+    'follows': ('reconcile_counters', 'rebuild_timelines'),
+}
+
+
+def chunks(values, size=IN_CHUNK):
+    iterator = iter(values)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def existing(queryset, field, values, *fields):
+    """Строки queryset, у которых field входит в values, по частям."""
+    for chunk in chunks(set(values)):
+        yield from queryset.filter(**{f'{field}__in': chunk}).values_list(
+            *fields or (field,), flat=not fields
+        )
+
+
+def create_with_ids(model, objects, kind):
+    """
+    bulk_create, после которого у объектов есть pk. PostgreSQL возвращает
+    id сам; на других базах они раздаются подряд после наибольшего, не
+    забывая id удалённых импортированных строк: на них ссылается ImportedId.
+    """
+    if not connection.features.can_return_ids_from_bulk_insert:
+        last = max(
+            model.objects.aggregate(last=Max('pk'))['last'] or 0,
+            ImportedId.objects.filter(kind=kind).aggregate(
+                last=Max('local_id')
+            )['last'] or 0,
+        )
+        for number, obj in enumerate(objects, 1):
+            obj.pk = last + number
+    model.objects.bulk_create(objects)
+
+
+class Lookup:
+    """
+    id по естественному ключу (имени пользователя, slug группы) с кэшем
+    в памяти: каждый ключ ищется в базе один раз за импорт, недостающие
+    строки создаются одним bulk_create.
+    """
+
+    def __init__(self, model, field, make):
+        self.model = model
+        self.field = field
+        self.make = make
+        self.ids = {}
+        self.created = 0
+
+    def resolve(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if missing:
+            self.load(missing)
+            new = missing - self.ids.keys()
+            if new:
+                self.model.objects.bulk_create(
+                    self.make(key) for key in new
+                )
+                self.created += len(new)
+                # SQLite не возвращает id из bulk_create
+                self.load(new)
+        return self.ids
+
+    def load(self, keys):
+        self.ids.update(existing(
+            self.model.objects, self.field, keys, self.field, 'pk'
+        ))
+
+
+def read(path, input_format):
+    """Записи файла по одной: строки NDJSON или строки CSV с заголовком."""
+    if path == '-':
+        source = nullcontext(sys.stdin)
+    else:
+        source = open(path, encoding='utf-8', newline='')
+    with source as file:
+        if input_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает посты, комментарии или подписки из NDJSON или '
+        'CSV (формат export_data) пачками через bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(export.EXPORTS))
+        parser.add_argument('path', help='Файл с данными или - для stdin')
+        parser.add_argument(
+            '--format',
+            choices=list(export.FORMATS),
+            default=None,
+            help='Формат файла (по умолчанию по расширению)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько записей вставлять в одной транзакции',
+        )
+        parser.add_argument(
+            '--skip-derived',
+            action='store_true',
+            help=(
+                'Не пересчитывать счётчики, ленты, поисковый индекс и '
+                'адреса видео после вставки'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        input_format = options['format'] or (
+            'csv' if options['path'].endswith('.csv') else 'ndjson'
+        )
+        # хешировать пароль для каждого нового автора слишком долго
+        password = make_password(None)
+        self.users = Lookup(
+            User, 'username',
+            lambda username: User(username=username, password=password),
+        )
+        self.groups = Lookup(
+            Group, 'slug', lambda slug: Group(title=slug, slug=slug),
+        )
+        insert = getattr(self, f'insert_{kind}')
+        started = time.monotonic()
+        read_count, inserted = 0, 0
+        try:
+            with explicit_created(Post, Comment):
+                for batch in chunks(
+                    read(options['path'], input_format),
+                    options['batch_size'],
+                ):
+                    with transaction.atomic():
+                        inserted += insert(batch)
+                    read_count += len(batch)
+                    self.stdout.write(
+                        f'{kind}: {read_count}', ending='\r'
+                    )
+        except (OSError, IntegrityError) as error:
+            raise CommandError(error)
+        except (KeyError, ValueError, TypeError) as error:
+            raise CommandError(
+                f'Неверная запись в пачке после {read_count}-й: {error!r}'
+            )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{kind}: добавлено {inserted}, пропущено '
+            f'{read_count - inserted} из {read_count} за {elapsed:.1f} с '
+            f'({read_count / elapsed if elapsed else 0:.0f} записей/с); '
+            f'новых пользователей {self.users.created}, '
+            f'групп {self.groups.created}'
+        ))
+        if options['skip_derived']:
+            return
+        for name in DERIVED[kind]:
+            if name == 'rebuild_search_index' and search.get_backend() is None:
+                continue
+            call_command(name, stdout=self.stdout)
+        self.stdout.write(
+            'Миниатюры картинок готовятся отдельно: '
+            'python manage.py warm_thumbnails'
+        )
+
+    def created(self, record):
+        if record.get('created'):
+            return export.parse_moment(record['created'])
+        return timezone.now()
+
+    def new_records(self, kind, batch):
+        """
+        Записи, которых ещё нет в ImportedId: повторный запуск пропускает
+        уже загруженное. Записи без id загружаются всегда.
+        """
+        ids = {int(record['id']) for record in batch if record.get('id')}
+        seen = set(existing(
+            ImportedId.objects.filter(kind=kind), 'source_id', ids
+        ))
+        records = []
+        for record in batch:
+            if record.get('id'):
+                source_id = int(record['id'])
+                if source_id in seen:
+                    continue
+                seen.add(source_id)
+            records.append(record)
+        return records
+
+    def remember(self, kind, batch, objects):
+        ImportedId.objects.bulk_create(
+            ImportedId(
+                kind=kind, source_id=int(record['id']), local_id=obj.pk
+            )
+            for record, obj in zip(batch, objects) if record.get('id')
+        )
+
+    def insert_posts(self, batch):
+        batch = self.new_records('posts', batch)
+        users = self.users.resolve(record['author'] for record in batch)
+        groups = self.groups.resolve(record.get('group') for record in batch)
+        posts = [
+            Post(
+                author_id=users[record['author']],
+                group_id=groups[record['group']] if record.get(
+                    'group'
+                ) else None,
+                text=record['text'],
+                created=self.created(record),
+                image=record.get('image') or '',
+                video=record.get('video') or '',
+            )
+            for record in batch
+        ]
+        create_with_ids(Post, posts, 'posts')
+        self.remember('posts', batch, posts)
+        scopes = {'index'}
+        scopes.update(f'profile:{record["author"]}' for record in batch)
+        scopes.update(
+            f'group:{record["group"]}' for record in batch
+            if record.get('group')
+        )
+        cache.bump(*scopes)
+        return len(posts)
+
+    def insert_comments(self, batch):
+        batch = self.new_records('comments', batch)
+        # посты ищутся по id из файла среди загруженных import_data
+        posts = dict(existing(
+            ImportedId.objects.filter(kind='posts'), 'source_id',
+            (int(record['post']) for record in batch),
+            'source_id', 'local_id',
+        ))
+        alive = set(existing(Post.objects, 'pk', posts.values()))
+        # комментарии к постам, которых нет в базе, пропускаются
+        batch = [
+            record for record in batch
+            if posts.get(int(record['post'])) in alive
+        ]
+        users = self.users.resolve(record['author'] for record in batch)
+        comments = [
+            Comment(
+                post_id=posts[int(record['post'])],
+                author_id=users[record['author']],
+                text=record['text'],
+                created=self.created(record),
+                comment_video=record.get('video') or '',
+            )
+            for record in batch
+        ]
+        create_with_ids(Comment, comments, 'comments')
+        self.remember('comments', batch, comments)
+        cache.bump(*{f'post:{comment.post_id}' for comment in comments})
+        return len(comments)
+
+    def insert_follows(self, batch):
+        users = self.users.resolve(itertools.chain.from_iterable(
+            (record['user'], record['author']) for record in batch
+        ))
+        pairs = {
+            (users[record['user']], users[record['author']])
+            for record in batch
+        }
+        pairs -= set(existing(
+            Follow.objects, 'user_id', (user for user, _ in pairs),
+            'user_id', 'author_id',
+        ))
+        # на себя не подписываются
+        pairs = {(user, author) for user, author in pairs if user != author}
+        # конфликт возможен, только если подписку создали параллельно
+        Follow.objects.bulk_create(
+            [Follow(user_id=user, author_id=author) for user, author in pairs],
+            ignore_conflicts=True,
+        )
+        usernames = {
+            users[record['author']]: record['author'] for record in batch
+        }
+        cache.bump(*itertools.chain.from_iterable(
+            (f'follow:{user}', f'profile:{usernames[author]}')
+            for user, author in pairs
+        ))
+        return len(pairs)
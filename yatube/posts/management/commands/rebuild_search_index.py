@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит полнотекстовый индекс постов и комментариев, '
+        'например после bulk_create, который не шлёт сигналов'
+    )
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            raise CommandError(
+                'Полнотекстовый индекс для этой БД не создаётся'
+            )
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
@@ -0,0 +1,231 @@
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from posts.models import Comment, Follow, Group, Post, User
+
+# сколько разных текстов заготовить: Faker медленный для миллионов строк
+TEXT_POOL = 2000
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса: k-й по популярности получает 1 / k ** exponent."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+@contextmanager
+def explicit_created(*models):
+    """Отключает auto_now_add, чтобы bulk_create сохранил свои даты."""
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками с неравномерной популярностью'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько дней распределить даты публикаций',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель закона Ципфа для популярности авторов и постов',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--skip-derived',
+            action='store_true',
+            help=(
+                'Не пересчитывать счётчики, ленты подписок и поисковый '
+                'индекс после вставки'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.end = timezone.now()
+        self.start = self.end - timedelta(days=options['days'])
+        self.texts = [
+            self.faker.paragraph(nb_sentences=self.random.randint(1, 8))
+            for _ in range(TEXT_POOL)
+        ]
+
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        # популярность не должна совпадать с порядком id
+        authors = self.random.sample(user_ids, len(user_ids))
+        author_weights = zipf_weights(len(authors), options['skew'])
+        with explicit_created(Post, Comment):
+            post_ids = self.create_posts(
+                options['posts'], authors, author_weights, group_ids
+            )
+            self.create_comments(
+                options['comments'], post_ids, user_ids, options['skew']
+            )
+        self.create_follows(
+            options['follows'], user_ids, authors, author_weights
+        )
+        if not options['skip_derived']:
+            call_command('reconcile_counters', stdout=self.stdout)
+            call_command('rebuild_timelines', stdout=self.stdout)
+            call_command('rebuild_search_index', stdout=self.stdout)
+
+    def insert(self, model, objects):
+        """Вставляет объекты пачками и возвращает id новых строк по порядку."""
+        last_id = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        total = 0
+        for batch in self.batches(objects):
+            # размер INSERT выбирает бэкенд: у SQLite свой лимит параметров
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+            self.stdout.write(f'{model.__name__}: {total}', ending='\r')
+        self.stdout.write(f'{model.__name__}: {total}')
+        # SQLite не возвращает id из bulk_create, поэтому перечитываем их
+        return list(model.objects.filter(pk__gt=last_id).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def batches(self, objects):
+        iterator = iter(objects)
+        while True:
+            batch = list(itertools.islice(iterator, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def moment(self, share):
+        """Дата на доле share (0..1) от начала периода до его конца."""
+        return self.start + (self.end - self.start) * share
+
+    def create_users(self, count):
+        # хешировать пароль для каждого пользователя слишком долго
+        password = make_password(None)
+        first_id = (User.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        return self.insert(User, (
+            User(
+                username=f'{self.faker.user_name()}_{first_id + number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+                date_joined=self.moment(self.random.random()),
+            )
+            for number in range(count)
+        ))
+
+    def create_groups(self, count):
+        first_id = (Group.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        return self.insert(Group, (
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'group-{first_id + number}',
+                description=self.random.choice(self.texts),
+            )
+            for number in range(count)
+        ))
+
+    def create_posts(self, count, authors, author_weights, group_ids):
+        group_weights = zipf_weights(len(group_ids), 1.0)
+
+        def posts():
+            for number in range(count):
+                group_id = None
+                if group_ids and self.random.random() < 0.5:
+                    group_id = self.random.choices(
+                        group_ids, cum_weights=group_weights
+                    )[0]
+                yield Post(
+                    author_id=self.random.choices(
+                        authors, cum_weights=author_weights
+                    )[0],
+                    group_id=group_id,
+                    text=self.random.choice(self.texts),
+                    # посты идут по времени, как и их id
+                    created=self.moment(number / max(count, 1)),
+                )
+        return self.insert(Post, posts())
+
+    def create_comments(self, count, post_ids, user_ids, skew):
+        if not post_ids or not user_ids:
+            return
+        # самые обсуждаемые — случайные посты, а не первые по id
+        ranked = self.random.sample(
+            range(len(post_ids)), len(post_ids)
+        )
+        weights = zipf_weights(len(ranked), skew)
+
+        def comments():
+            for _ in range(count):
+                index = self.random.choices(ranked, cum_weights=weights)[0]
+                posted = index / len(post_ids)
+                yield Comment(
+                    post_id=post_ids[index],
+                    author_id=self.random.choice(user_ids),
+                    text=self.random.choice(self.texts)[:500],
+                    created=self.moment(
+                        posted + (1 - posted) * self.random.random()
+                    ),
+                )
+        self.insert(Comment, comments())
+
+    def create_follows(self, count, user_ids, authors, author_weights):
+        if len(user_ids) < 2:
+            return
+        # у самых популярных авторов пары кончаются, оставляем запас
+        count = min(count, len(user_ids) * (len(user_ids) - 1) // 2)
+        existing = set(Follow.objects.values_list('user_id', 'author_id'))
+
+        def follows():
+            created = 0
+            while created < count:
+                pair = (
+                    self.random.choice(user_ids),
+                    self.random.choices(
+                        authors, cum_weights=author_weights
+                    )[0],
+                )
+                if pair[0] == pair[1] or pair in existing:
+                    continue
+                existing.add(pair)
+                created += 1
+                yield Follow(user_id=pair[0], author_id=pair[1])
+        self.insert(Follow, follows())
@@ -0,0 +1,59 @@
+import time
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+def warm(name):
+    try:
+        generate(name)
+    except Exception as error:
+        return name, str(error)
+    return name, None
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт миниатюры всех геометрий для картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=None,
+            help='Число процессов (по умолчанию по числу ядер)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=50,
+            help='Сколько картинок получает процесс за раз',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        started = time.monotonic()
+        done, failed = 0, 0
+        # дочерние процессы не должны унаследовать открытые соединения
+        connections.close_all()
+        with Pool(options['processes']) as pool:
+            results = pool.imap_unordered(
+                warm,
+                names.iterator(),
+                chunksize=options['chunk_size'],
+            )
+            for name, error in results:
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                else:
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, с ошибками: {failed}, '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,61 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:42
+
+from django.db import migrations, models
+from embed_video.backends import (EmbedVideoException, SoundCloudBackend,
+                                  detect_backend)
+
+BATCH_SIZE = 500
+
+
+def embed_url(url):
+    # как posts.video.embed_url, но без сети: адрес SoundCloud узнаётся
+    # через oEmbed, его после миграции заполнит backfill_video_embeds
+    try:
+        backend = detect_backend(url)
+        if isinstance(backend, SoundCloudBackend):
+            return ''
+        return backend.url
+    except EmbedVideoException:
+        return ''
+
+
+def fill_embed_urls(apps, schema_editor):
+    for model, source, target in (
+        ('Post', 'video', 'video_embed_url'),
+        ('Comment', 'comment_video', 'comment_video_embed_url'),
+    ):
+        Model = apps.get_model('posts', model)
+        rows = []
+        for obj in Model.objects.exclude(**{source: ''}).exclude(
+            **{f'{source}__isnull': True}
+        ).only('pk', source).iterator(chunk_size=BATCH_SIZE):
+            url = embed_url(getattr(obj, source))
+            if not url:
+                continue
+            setattr(obj, target, url)
+            rows.append(obj)
+            if len(rows) >= BATCH_SIZE:
+                Model.objects.bulk_update(rows, [target])
+                rows = []
+        Model.objects.bulk_update(rows, [target])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_auto_20261018_1933'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='comment_video_embed_url',
+            field=models.URLField(blank=True, editable=False, verbose_name='Адрес встраиваемого видео'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='video_embed_url',
+            field=models.URLField(blank=True, editable=False, verbose_name='Адрес встраиваемого видео'),
+        ),
+        migrations.RunPython(fill_embed_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:10
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    # оставляем самую раннюю подписку из каждой пары;
+    # счётчики потом сверит reconcile_counters
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for pair in list(duplicates):
+        Follow.objects.filter(
+            user_id=pair['user'], author_id=pair['author']
+        ).exclude(id=pair['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_auto_20261018_1944'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_timelines(apps, schema_editor):
+    # ленты подписок, появившиеся в 0017, для подписок, которые уже были:
+    # без этого follow_index пуст до ручного rebuild_timelines
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    user_ids = Follow.objects.exclude(
+        user_id__in=TimelineEntry.objects.values('user_id')
+    ).values_list('user_id', flat=True).distinct()
+    for user_id in list(user_ids):
+        posts = Post.objects.filter(
+            author_id__in=Follow.objects.filter(
+                user_id=user_id
+            ).values('author_id')
+        ).order_by('-created', '-id').values_list('id', 'created')
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id, post_id=post_id, created=created
+                )
+                for post_id, created in posts[:settings.TIMELINE_SIZE]
+            ],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
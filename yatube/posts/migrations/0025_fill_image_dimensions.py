@@ -0,0 +1,51 @@
+from django.core.files.images import get_image_dimensions
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def orientation(width, height):
+    # как Post.set_image_dimensions: у исторической модели методов нет
+    if not width or not height:
+        return ''
+    return 'portrait' if height > width else 'landscape'
+
+
+def fill_image_dimensions(apps, schema_editor):
+    # размеры из 0018 для картинок, загруженных до неё: без этого все
+    # вертикальные картинки выводятся как горизонтальные. Читаются только
+    # заголовки файлов; недоступные файлы пропускаются
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.exclude(image='').filter(
+        image_width__isnull=True
+    ).only('id', 'image')
+    batch = []
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        try:
+            with post.image.open('rb') as image:
+                width, height = get_image_dimensions(image)
+        except (OSError, ValueError):
+            continue
+        post.image_width = width
+        post.image_height = height
+        post.image_orientation = orientation(width, height)
+        batch.append(post)
+        if len(batch) >= BATCH_SIZE:
+            Post.objects.bulk_update(
+                batch, ['image_width', 'image_height', 'image_orientation']
+            )
+            batch = []
+    Post.objects.bulk_update(
+        batch, ['image_width', 'image_height', 'image_orientation']
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_fill_timelines'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_image_dimensions, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.core.files.images import get_image_dimensions
 from django.db import models
 from embed_video.fields import EmbedVideoField
 
+from .video import embed_url
+
 User = get_user_model()
 
 
@@ -15,6 +18,13 @@ class Group(models.Model):
 
 
 class Post(models.Model):
+    PORTRAIT = 'portrait'
+    LANDSCAPE = 'landscape'
+    ORIENTATION_CHOICES = (
+        (PORTRAIT, 'Портретная'),
+        (LANDSCAPE, 'Альбомная'),
+    )
+
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -39,6 +49,27 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # размеры картинки запоминаются при загрузке, чтобы шаблоны
+    # не открывали файл ради выбора ориентации
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_orientation = models.CharField(
+        'Ориентация картинки',
+        max_length=9,
+        choices=ORIENTATION_CHOICES,
+        blank=True,
+        editable=False
+    )
     created = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
@@ -48,15 +79,64 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    video_embed_url = models.URLField(
+        'Адрес встраиваемого видео',
+        blank=True,
+        editable=False
+    )
+    # счётчик ведёт posts.counters, сверяет reconcile_counters
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-created']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # ленты листаются по (created, id): страница берётся из индекса
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='posts_post_feed_idx',
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='posts_post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='posts_post_group_feed_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        if not self.image:
+            self.set_image_dimensions(None, None)
+        elif not self.image._committed:
+            # новый файл из формы ещё не сохранён: размеры читаем из него
+            self.set_image_dimensions(*get_image_dimensions(self.image.file))
+        self.video_embed_url = embed_url(self.video)
+        super().save(*args, **kwargs)
+
+    def set_image_dimensions(self, width, height):
+        self.image_width = width
+        self.image_height = height
+        if not width or not height:
+            self.image_orientation = ''
+        elif height > width:
+            self.image_orientation = self.PORTRAIT
+        else:
+            self.image_orientation = self.LANDSCAPE
+
+    @property
+    def is_portrait(self):
+        return self.image_orientation == self.PORTRAIT
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -84,6 +164,23 @@ class Comment(models.Model):
         blank=True,
         null=True
     )
+    comment_video_embed_url = models.URLField(
+        'Адрес встраиваемого видео',
+        blank=True,
+        editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='posts_comment_post_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.comment_video_embed_url = embed_url(self.comment_video)
+        super().save(*args, **kwargs)
 
 
 class Follow(models.Model):
@@ -97,3 +194,74 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            # уникальный индекс заодно ищет пару (user, author)
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='posts_follow_unique',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, чтобы не считать COUNT(*) на каждой странице."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    """Готовая лента подписок: пост попадает сюда при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    # копия Post.created, чтобы лента сортировалась по своему индексу
+    created = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created', '-post']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='posts_timeline_feed_idx',
+            ),
+        ]
+
+
+class ImportedId(models.Model):
+    """
+    Какой строкой у нас стал пост или комментарий из файла import_data:
+    id из другой базы могут совпасть с нашими, поэтому не переиспользуются.
+    """
+    # вид записи, как в import_data: posts или comments
+    kind = models.CharField(max_length=16)
+    source_id = models.BigIntegerField()
+    local_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'source_id'],
+                name='posts_importedid_unique',
+            ),
+        ]
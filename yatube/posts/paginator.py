@@ -1,8 +1,215 @@
-from django.core.paginator import Paginator
+import base64
+import json
+
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(direction, position=None):
+    """Упаковывает направление и позицию (created, id) в непрозрачный токен."""
+    payload = [direction]
+    if position is not None:
+        created, pk = position
+        payload += [created.isoformat(), pk]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, позиция) или None для битого токена."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode())
+        if not isinstance(payload, list) or len(payload) not in (1, 3):
+            return None
+        direction = payload[0]
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        if len(payload) == 1:
+            return direction, None
+        created = parse_datetime(payload[1])
+        pk = int(payload[2])
+        # id вне bigint база не примет: OverflowError вместо пустой выборки
+        if created is None or not 0 <= pk <= MAX_ID:
+            return None
+        return direction, (created, pk)
+    except (ValueError, TypeError, IndexError, KeyError, AttributeError):
+        return None
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк от планировщика PostgreSQL: pg_class.reltuples
+    для всей таблицы, EXPLAIN — для выборки с условиями.
+    На других БД и для таблиц без статистики возвращает None.
+    """
+    db = connections[queryset.db]
+    if db.vendor != 'postgresql':
+        return None
+    with db.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else -1
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]['Plan']['Plan Rows']
+    # -1 в reltuples: таблицу ещё не анализировали
+    return int(estimate) if estimate >= 0 else None
+
+
+class ApproximatePaginator(Paginator):
+    """
+    Paginator, который на больших таблицах не выполняет COUNT(*):
+    выше APPROXIMATE_COUNT_THRESHOLD число страниц считается по оценке.
+    """
 
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            estimate = estimate_count(self.object_list)
+            if (estimate is not None
+                    and estimate >= settings.APPROXIMATE_COUNT_THRESHOLD):
+                return estimate
+        return super().count
 
-def paginator_method(request, posts):
-    paginator = Paginator(posts, settings.POST_AMOUNT)
+
+class CursorPaginator(ApproximatePaginator):
+    """
+    Keyset-пагинация по паре полей (created, id) в порядке убывания,
+    а с ascending=True — возрастания.
+
+    Страница N стоит столько же, сколько первая: вместо OFFSET и COUNT(*)
+    берётся per_page + 1 строк после (или до) позиции из токена.
+    Номерные страницы Paginator по-прежнему доступны для старых ссылок,
+    на больших таблицах их число считается по оценке планировщика.
+    """
+
+    def __init__(self, object_list, per_page, keys=('created', 'id'),
+                 ascending=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.keys = keys
+        self.ascending = ascending
+
+    # пропуск в списке номеров страниц, как в Django 3.2
+    ELLIPSIS = '…'
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """
+        Номера страниц вокруг number плюс on_ends первых и последних,
+        с ELLIPSIS на месте пропусков: шаблон не перебирает все страницы.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def position(self, obj):
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    def _seek(self, position, older):
+        created, pk = self.keys
+        lookup = 'lt' if older else 'gt'
+        value, pk_value = position
+        return Q(**{f'{created}__{lookup}': value}) | Q(
+            **{created: value, f'{pk}__{lookup}': pk_value}
+        )
+
+    def cursor_page(self, cursor=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        direction, position = decoded or (NEXT, None)
+        created, pk = self.keys
+        queryset = self.object_list
+        # идём к более старым строкам, если листаем вперёд по убыванию
+        # или назад по возрастанию
+        older = (direction == NEXT) != self.ascending
+        if older:
+            queryset = queryset.order_by(f'-{created}', f'-{pk}')
+        else:
+            queryset = queryset.order_by(created, pk)
+        if position is not None:
+            queryset = queryset.filter(self._seek(position, older=older))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            has_next, has_previous = has_more, position is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = position is not None, has_more
+        # номер страницы неизвестен: шаблон ориентируется на токены
+        page = self._get_page(rows, None, self)
+        page.is_cursor = True
+        page.next_cursor = None
+        page.previous_cursor = None
+        page.last_cursor = encode_cursor(PREVIOUS)
+        if rows and has_next:
+            page.next_cursor = encode_cursor(
+                NEXT, self.position(rows[-1])
+            )
+        if rows and has_previous:
+            page.previous_cursor = encode_cursor(
+                PREVIOUS, self.position(rows[0])
+            )
+        return page
+
+
+def paginator_method(request, posts, keys=('created', 'id'), count=None):
+    paginator = CursorPaginator(posts, settings.POST_AMOUNT, keys=keys)
+    if count is not None:
+        # готовый счётчик вместо отдельного COUNT(*) для номерных страниц
+        paginator.count = count
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        # старые ссылки вида ?page=N продолжают работать через OFFSET
+        page = paginator.get_page(page_number)
+        page.elided_page_range = list(
+            paginator.get_elided_page_range(page.number)
+        )
+        return page
+    return paginator.cursor_page(request.GET.get('cursor'))
+
+
+def comments_page(request, post, columns=None):
+    """
+    Порция комментариев поста, от старых к новым, с авторами;
+    columns — только эти колонки вместо всех.
+    """
+    comments = post.comments.select_related('author').order_by(
+        'created', 'id'
+    )
+    if columns is not None:
+        comments = comments.only(*columns)
+    paginator = CursorPaginator(
+        comments,
+        settings.COMMENTS_PER_PAGE,
+        ascending=True,
+    )
+    return paginator.cursor_page(request.GET.get('cursor'))
@@ -0,0 +1,275 @@
+"""
+Полнотекстовый поиск по постам и комментариям к ним.
+
+В PostgreSQL документ поста — tsvector в таблице posts_search с GIN-индексом
+(текст поста с весом A, комментарии — B). В SQLite та же таблица —
+виртуальная FTS5. Таблица не описана моделью: её создаёт миграция 0023,
+а поддерживают сигналы из posts/signals.py.
+"""
+import base64
+import json
+import re
+import sqlite3
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connection
+
+from .models import Post
+
+TABLE = 'posts_search'
+WORD = re.compile(r'\w+')
+
+
+class PostgresBackend:
+    @staticmethod
+    def available():
+        return True
+
+    def install(self, cursor):
+        cursor.execute(f'''
+            CREATE TABLE {TABLE} (
+                post_id integer PRIMARY KEY REFERENCES posts_post (id)
+                    ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+                vector tsvector NOT NULL
+            )
+        ''')
+        cursor.execute(
+            f'CREATE INDEX {TABLE}_vector_idx ON {TABLE} USING gin (vector)'
+        )
+        self.index(cursor)
+
+    def uninstall(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def index(self, cursor, post_id=None):
+        where = 'WHERE p.id = %s' if post_id is not None else ''
+        params = [settings.SEARCH_CONFIG] * 2
+        if post_id is not None:
+            params.append(post_id)
+        cursor.execute(f'''
+            INSERT INTO {TABLE} (post_id, vector)
+            SELECT p.id,
+                setweight(to_tsvector(%s, p.text), 'A')
+                || setweight(to_tsvector(
+                    %s, coalesce(string_agg(c.text, ' '), '')
+                ), 'B')
+            FROM posts_post p
+            LEFT JOIN posts_comment c ON c.post_id = p.id
+            {where}
+            GROUP BY p.id
+            ON CONFLICT (post_id) DO UPDATE SET vector = EXCLUDED.vector
+        ''', params)
+
+    def add_comment(self, cursor, post_id, text):
+        cursor.execute(f'''
+            UPDATE {TABLE}
+            SET vector = vector || setweight(to_tsvector(%s, %s), 'B')
+            WHERE post_id = %s
+        ''', [settings.SEARCH_CONFIG, text, post_id])
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {TABLE} WHERE post_id = %s', [post_id])
+
+    def find(self, cursor, query, position, limit):
+        seek, params = seek_sql(position)
+        cursor.execute(f'''
+            SELECT post_id, score FROM (
+                SELECT post_id, ts_rank(vector, query) AS score
+                FROM {TABLE}, plainto_tsquery(%s, %s) query
+                WHERE vector @@ query
+            ) found
+            {seek}
+            ORDER BY score DESC, post_id DESC
+            LIMIT %s
+        ''', [settings.SEARCH_CONFIG, query, *params, limit])
+        return cursor.fetchall()
+
+
+class SqliteBackend:
+    @staticmethod
+    def available():
+        return fts5_available()
+
+    def install(self, cursor):
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {TABLE} USING fts5(text, comments)'
+        )
+        self.index(cursor)
+
+    def uninstall(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def index(self, cursor, post_id=None):
+        where, params = '', []
+        if post_id is not None:
+            where, params = 'WHERE p.id = %s', [post_id]
+            self.remove(cursor, post_id)
+        else:
+            cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f'''
+            INSERT INTO {TABLE} (rowid, text, comments)
+            SELECT p.id, p.text, coalesce(group_concat(c.text, ' '), '')
+            FROM posts_post p
+            LEFT JOIN posts_comment c ON c.post_id = p.id
+            {where}
+            GROUP BY p.id
+        ''', params)
+
+    def add_comment(self, cursor, post_id, text):
+        cursor.execute(f'''
+            UPDATE {TABLE} SET comments = comments || ' ' || %s
+            WHERE rowid = %s
+        ''', [text, post_id])
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+    def find(self, cursor, query, position, limit):
+        # слова в кавычках — чтобы ввод не читался как синтаксис FTS5;
+        # звёздочка заменяет стемминг, которого у unicode61 нет
+        match = ' '.join(
+            '"{}"*'.format(word) for word in WORD.findall(query)
+        )
+        if not match:
+            return []
+        seek, params = seek_sql(position, pk='rowid')
+        cursor.execute(f'''
+            SELECT rowid, score FROM (
+                SELECT rowid, -bm25({TABLE}, 10.0, 1.0) AS score
+                FROM {TABLE}
+                WHERE {TABLE} MATCH %s
+            )
+            {seek}
+            ORDER BY score DESC, rowid DESC
+            LIMIT %s
+        ''', [match, *params, limit])
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'postgresql': PostgresBackend,
+    'sqlite': SqliteBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def fts5_available():
+    with sqlite3.connect(':memory:') as db:
+        options = {row[0] for row in db.execute('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+
+def get_backend(db=None):
+    backend = BACKENDS.get((db or connection).vendor)
+    if backend is None or not backend.available():
+        return None
+    return backend()
+
+
+def seek_sql(position, pk='post_id'):
+    if position is None:
+        return '', []
+    score, post_id = position
+    return (
+        f'WHERE score < %s OR (score = %s AND {pk} < %s)',
+        [score, score, post_id],
+    )
+
+
+def install(db):
+    backend = get_backend(db)
+    if backend is not None:
+        with db.cursor() as cursor:
+            backend.install(cursor)
+
+
+def uninstall(db):
+    backend = get_backend(db)
+    if backend is not None:
+        with db.cursor() as cursor:
+            backend.uninstall(cursor)
+
+
+def index_post(post_id):
+    backend = get_backend()
+    if backend is not None:
+        with connection.cursor() as cursor:
+            backend.index(cursor, post_id)
+
+
+def add_comment(comment):
+    backend = get_backend()
+    if backend is not None:
+        with connection.cursor() as cursor:
+            backend.add_comment(cursor, comment.post_id, comment.text)
+
+
+def remove_post(post_id):
+    backend = get_backend()
+    if backend is not None:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, post_id)
+
+
+def rebuild():
+    backend = get_backend()
+    if backend is not None:
+        with connection.cursor() as cursor:
+            backend.index(cursor)
+
+
+def encode_position(score, post_id):
+    raw = json.dumps([score, post_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_position(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        score, post_id = json.loads(raw.decode())
+        return float(score), int(post_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def find(query, position=None, limit=None):
+    """Список (id поста, релевантность) от лучших совпадений к худшим."""
+    backend = get_backend()
+    if backend is None:
+        # нет полнотекстового индекса: простой поиск по тексту постов
+        posts = Post.objects.filter(text__icontains=query).order_by('-id')
+        if position is not None:
+            posts = posts.filter(id__lt=position[1])
+        return [(pk, 0.0) for pk in posts.values_list('id', flat=True)[
+            :limit
+        ]]
+    with connection.cursor() as cursor:
+        return backend.find(cursor, query, position, limit)
+
+
+def search_page(query, cursor=None, per_page=None):
+    """
+    Страница результатов поиска для posts/includes/paginator.html:
+    листается вперёд токеном next_cursor по паре (релевантность, id).
+    """
+    per_page = per_page or settings.POST_AMOUNT
+    position = decode_position(cursor) if cursor else None
+    found = find(query, position, per_page + 1)
+    has_next = len(found) > per_page
+    found = found[:per_page]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in found]
+    )
+    # пост мог быть удалён после индексации
+    object_list = [posts[post_id] for post_id, _ in found if post_id in posts]
+    page = Page(object_list, None, Paginator(object_list, per_page))
+    page.is_cursor = True
+    page.previous_cursor = None
+    page.last_cursor = None
+    page.next_cursor = None
+    if has_next:
+        post_id, score = found[-1]
+        page.next_cursor = encode_position(score, post_id)
+    return page
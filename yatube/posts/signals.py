@@ -0,0 +1,125 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cache, counters, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # при смене группы устаревает и страница прежней группы
+    instance._old_group_slug = None
+    if instance.pk is not None:
+        instance._old_group_slug = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    scopes = {
+        'index',
+        f'profile:{instance.author.username}',
+        f'post:{instance.pk}',
+    }
+    if instance.group_id is not None:
+        scopes.add(f'group:{instance.group.slug}')
+    if getattr(instance, '_old_group_slug', None):
+        scopes.add(f'group:{instance._old_group_slug}')
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        followers = timeline.fan_out(instance)
+        scopes.update(f'follow:{user_id}' for user_id in followers)
+    search.index_post(instance.pk)
+    cache.bump(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    search.remove_post(instance.pk)
+    # удалённый пост пропадает из лент, а ETag его страницы
+    # больше не должен совпасть
+    scopes = {
+        'index',
+        f'profile:{instance.author.username}',
+        f'post:{instance.pk}',
+    }
+    if instance.group_id is not None:
+        scopes.add(f'group:{instance.group.slug}')
+    cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+        search.add_comment(instance)
+    else:
+        # правка комментария: документ поста собираем заново
+        search.index_post(instance.post_id)
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    search.index_post(instance.post_id)
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.user_id, following_count=1)
+        counters.change_user(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        cache.bump(
+            f'follow:{instance.user_id}',
+            f'profile:{instance.author.username}',
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.user_id, following_count=-1)
+    counters.change_user(instance.author_id, followers_count=-1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    cache.bump(
+        f'follow:{instance.user_id}',
+        f'profile:{instance.author.username}',
+    )
+
+
+def group_scopes(group):
+    # ссылка на группу есть в карточках ленты и профилей её авторов
+    authors = Post.objects.filter(group=group).order_by().values_list(
+        'author__username', flat=True
+    ).distinct()
+    return [
+        'groups', 'index', f'group:{group.slug}',
+        *(f'profile:{username}' for username in authors),
+    ]
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    cache.bump(*group_scopes(instance))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # после удаления у постов уже group=NULL, авторов не найти
+    instance._scopes = group_scopes(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.bump(*instance._scopes)
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import admin
+from ..models import Comment, Group, Post, User
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.groups = [
+            Group.objects.create(title=f'group{i}', slug=f'group{i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'post{i}',
+                author=self.admin,
+                group=self.groups[i % len(self.groups)],
+            )
+            Comment.objects.create(post=post, author=self.admin, text='c')
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for name in ('admin:posts_post_changelist',
+                     'admin:posts_comment_changelist'):
+            with self.subTest(name=name):
+                url = reverse(name)
+                self.create_posts(2)
+                few, _ = self.changelist_queries(url)
+                self.create_posts(20)
+                many, _ = self.changelist_queries(url)
+                self.assertEqual(few, many)
+
+    def test_group_column(self):
+        self.create_posts(1)
+        post = Post.objects.get()
+        _, response = self.changelist_queries(
+            reverse('admin:posts_post_changelist')
+        )
+        self.assertContains(
+            response,
+            f'<option value="{post.group_id}" selected>{post.group}</option>',
+            html=True,
+        )
+        self.assertContains(response, 'field-comments">1<')
+
+    def test_change_group_in_list(self):
+        self.create_posts(1)
+        post = Post.objects.get()
+        response = self.client.post(reverse('admin:posts_post_changelist'), {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': post.pk,
+            'form-0-group': self.groups[2].pk,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.group, self.groups[2])
+
+    def test_search_limit_is_reported(self):
+        self.create_posts(3)
+        url = reverse('admin:posts_post_changelist')
+        with mock.patch.object(admin, 'ADMIN_SEARCH_LIMIT', 2):
+            response = self.client.get(url, {'q': 'post'})
+            self.assertEqual(len(response.context['cl'].result_list), 2)
+            self.assertContains(response, 'Показаны первые 2 совпадений')
+            response = self.client.get(url, {'q': 'post1'})
+            self.assertEqual(len(response.context['cl'].result_list), 1)
+            self.assertNotContains(response, 'Показаны первые')
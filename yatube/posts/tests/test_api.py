@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='apigroup', slug='apigroup', description='description'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'apipost{i}',
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(settings.POST_AMOUNT + 3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_posts_cursor(self):
+        url = reverse('posts:api_posts')
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), settings.POST_AMOUNT)
+        self.assertEqual(first['results'][0]['text'], self.posts[-1].text)
+        self.assertEqual(first['results'][0]['author'], 'api_author')
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in second['results']],
+            [post.pk for post in reversed(self.posts[:3])]
+        )
+        self.assertIsNone(second['next'])
+
+    def test_bad_cursor(self):
+        post = self.posts[0]
+        urls = [
+            reverse('posts:api_posts'),
+            reverse('posts:api_comments', args=[post.pk]),
+            reverse('posts:api_follow'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url, {'cursor': 'garbage'})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json(), {'detail': 'Неверный курсор'}
+                )
+        for cursor in ('²', str(10 ** 30)):
+            response = self.client.get(
+                reverse('posts:api_groups'), {'cursor': cursor}
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fields(self):
+        url = reverse('posts:api_posts')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,group'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'group'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('auth_user', sql)
+        response = self.client.get(url, {'fields': 'id,unknown'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters(self):
+        response = self.client.get(
+            reverse('posts:api_posts'), {'group': self.group.slug}
+        )
+        groups = {post['group'] for post in response.json()['results']}
+        self.assertEqual(groups, {self.group.slug})
+
+    def test_post_and_comments(self):
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='apicomm')
+        response = self.client.get(reverse('posts:api_post', args=[post.pk]))
+        self.assertEqual(response.json()['comments_count'], 1)
+        response = self.client.get(
+            reverse('posts:api_comments', args=[post.pk])
+        )
+        self.assertEqual(
+            response.json()['results'][0]['author'], 'api_reader'
+        )
+        response = self.client.get(reverse('posts:api_post', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+
+    def test_groups_cache_is_bumped(self):
+        url = reverse('posts:api_groups')
+        self.assertEqual(len(self.client.get(url).json()['results']), 1)
+        Group.objects.create(title='new', slug='new')
+        self.assertEqual(len(self.client.get(url).json()['results']), 2)
+
+    def test_follow(self):
+        url = reverse('posts:api_follow')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.reader_client.get(url, {'fields': 'id'})
+        self.assertEqual(
+            response.json()['results'][0], {'id': self.posts[-1].pk}
+        )
+
+    def test_conditional_get_and_read_only(self):
+        url = reverse('posts:api_posts')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.post(url).status_code, 405)
@@ -0,0 +1,248 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import benchmark
+from ..models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                      UserStats)
+
+
+class SeedDataTest(TestCase):
+    def test_seed_data(self):
+        call_command(
+            'seed_data',
+            users=20,
+            groups=3,
+            posts=50,
+            comments=60,
+            follows=15,
+            seed=1,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertEqual(Follow.objects.count(), 15)
+        self.assertEqual(
+            UserStats.objects.aggregate(Sum('posts_count'))[
+                'posts_count__sum'
+            ],
+            50
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+        # даты постов растут вместе с id
+        dates = list(Post.objects.order_by('pk').values_list(
+            'created', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+
+
+class BenchmarkSummaryTest(TestCase):
+    def test_describe(self):
+        rows = [(200, elapsed / 1000, 3) for elapsed in range(1, 101)]
+        rows.append((500, 0.5, 1))
+        summary = benchmark.describe(rows, duration=10)
+        self.assertEqual(summary['requests'], 101)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['throughput_rps'], 10.1)
+        self.assertEqual(summary['p50_ms'], 50)
+        self.assertEqual(summary['p99_ms'], 100)
+        self.assertEqual(summary['queries_max'], 3)
+
+    def test_run_requires_seeded_database(self):
+        with self.assertRaises(ValueError):
+            benchmark.run(None, duration=0, warmup=0)
+
+
+class ExportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='export_author')
+        cls.reader = User.objects.create_user(username='export_reader')
+        cls.group = Group.objects.create(title='export', slug='export')
+        cls.grouped = Post.objects.create(
+            text='в группе', author=cls.author, group=cls.group
+        )
+        cls.plain = Post.objects.create(text='без группы', author=cls.reader)
+        Comment.objects.create(
+            post=cls.grouped, author=cls.reader, text='коммент'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, *args, **options):
+        out = StringIO()
+        call_command(
+            'export_data', *args, stdout=out, stderr=StringIO(), **options
+        )
+        return out.getvalue()
+
+    def test_ndjson(self):
+        lines = self.export('posts', chunk_size=1).splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [self.grouped.pk, self.plain.pk]
+        )
+        self.assertEqual(records[0]['group'], 'export')
+        self.assertEqual(records[0]['author'], 'export_author')
+        self.assertEqual(
+            records[0]['created'], self.grouped.created.isoformat()
+        )
+
+    def test_csv_with_filters(self):
+        rows = list(csv.reader(StringIO(
+            self.export('posts', format='csv', group='export')
+        )))
+        self.assertEqual(rows[0][:3], ['id', 'author', 'group'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], str(self.grouped.pk))
+        rows = list(csv.reader(StringIO(
+            self.export('comments', format='csv', author='export_reader')
+        )))
+        self.assertEqual(rows[1][3], 'коммент')
+        day = self.plain.created.date()
+        self.assertEqual(len(self.export(
+            'posts', since=str(day), until=str(day)
+        ).splitlines()), 2)
+        self.assertEqual(self.export(
+            'posts', until=str(day.replace(year=day.year - 1))
+        ), '')
+
+    def test_bad_filters(self):
+        with self.assertRaises(CommandError):
+            self.export('posts', since='вчера')
+        with self.assertRaises(CommandError):
+            self.export('follows', group='export')
+
+    def test_endpoint_is_staff_only(self):
+        url = reverse('posts:export', args=['follows'])
+        client = Client()
+        client.force_login(self.reader)
+        self.assertEqual(client.get(url).status_code, 302)
+        staff = User.objects.create_user(username='export_staff')
+        staff.is_staff = True
+        staff.save()
+        client.force_login(staff)
+        response = client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertIn('follows.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+            content.splitlines(),
+            ['id,user,author', f'{Follow.objects.get().pk},export_reader,'
+             'export_author']
+        )
+        self.assertEqual(client.get(url, {'since': 'x'}).status_code, 400)
+        self.assertEqual(
+            client.get(reverse('posts:export', args=['users'])).status_code,
+            404
+        )
+
+
+def ndjson(*records):
+    return '\n'.join(json.dumps(record) for record in records)
+
+
+class ImportDataTest(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def write(self, name, text):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def load(self, *args, **options):
+        out = StringIO()
+        call_command('import_data', *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_posts_comments_follows(self):
+        posts = self.write('posts.ndjson', ndjson(
+            {'id': 501, 'author': 'legacy', 'group': 'old', 'text': 'первый',
+             'created': '2020-01-02T03:04:05+00:00',
+             'video': 'https://www.youtube.com/watch?v=jNQXAC9IVRw'},
+            {'id': 502, 'author': 'legacy', 'group': None, 'text': 'второй',
+             'created': '2020-01-03'},
+        ))
+        output = self.load('posts', posts, batch_size=1)
+        self.assertIn('добавлено 2', output)
+        first = Post.objects.get(text='первый')
+        self.assertEqual(first.author.username, 'legacy')
+        self.assertEqual(first.group.slug, 'old')
+        self.assertEqual(first.created.year, 2020)
+        # адрес видео и счётчики заполняет проход после вставки
+        self.assertIn('jNQXAC9IVRw', first.video_embed_url)
+        self.assertEqual(first.author.stats.posts_count, 2)
+        # повторный запуск ничего не дублирует
+        self.assertIn('добавлено 0', self.load('posts', posts))
+        self.assertEqual(Post.objects.count(), 2)
+
+        comments = self.write(
+            'comments.csv',
+            'id,post,author,text,created,video\n'
+            '1,501,reader,коммент,,\n'
+            '2,999,reader,к посту не отсюда,,\n'
+        )
+        output = self.load('comments', comments, skip_derived=True)
+        self.assertIn('добавлено 1, пропущено 1', output)
+        self.assertEqual(Comment.objects.get().author.username, 'reader')
+        self.assertEqual(Comment.objects.get().post, first)
+        self.assertEqual(Post.objects.get(pk=first.pk).comments_count, 0)
+
+        follows = self.write('follows.ndjson', ndjson(
+            {'user': 'reader', 'author': 'legacy'},
+            {'user': 'reader', 'author': 'legacy'},
+            {'user': 'legacy', 'author': 'legacy'},
+        ))
+        self.assertIn('добавлено 1', self.load('follows', follows))
+        self.assertIn('добавлено 0', self.load('follows', follows))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='reader', post__text='второй'
+        ).exists())
+
+    def test_ids_from_file_do_not_collide_with_local_rows(self):
+        author = User.objects.create_user(username='local')
+        local = [
+            Post.objects.create(text=f'local{i}', author=author)
+            for i in range(3)
+        ]
+        posts = self.write('posts.ndjson', ndjson(*(
+            {'id': post.pk, 'author': 'legacy', 'text': f'legacy{post.pk}'}
+            for post in local
+        )))
+        self.assertIn('добавлено 3', self.load('posts', posts))
+        self.assertIn('добавлено 0', self.load('posts', posts))
+        for post in local:
+            post.refresh_from_db()
+            self.assertEqual(post.author, author)
+        comments = self.write('comments.ndjson', ndjson(
+            {'id': 1, 'post': local[0].pk, 'author': 'reader',
+             'text': 'к старому посту'},
+        ))
+        self.assertIn(
+            'добавлено 1', self.load('comments', comments, skip_derived=True)
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, f'legacy{local[0].pk}')
+        self.assertEqual(comment.post.author.username, 'legacy')
+
+    def test_bad_input(self):
+        path = self.write('posts.ndjson', '{"text": "без автора"}\n')
+        with self.assertRaises(CommandError):
+            self.load('posts', path)
+        with self.assertRaises(CommandError):
+            self.load('posts', os.path.join(self.folder, 'missing.ndjson'))
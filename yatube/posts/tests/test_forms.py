@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -87,3 +88,38 @@ class PostCreateFormTests(TestCase):
             follow=True
         )
         self.assertNotEqual(self.post_data_edit['text'], self.post.text)
+
+    def test_create_post_stores_image_dimensions(self):
+        uploaded = SimpleUploadedFile(
+            name='dimensions.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'DimensionsPost', 'image': uploaded},
+        )
+        post = Post.objects.get(text='DimensionsPost')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_orientation, Post.LANDSCAPE)
+        self.assertFalse(post.is_portrait)
+
+    def test_create_post_schedules_thumbnails(self):
+        uploaded = SimpleUploadedFile(
+            name='thumbnails.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        # TestCase не доходит до коммита, поэтому колбэк вызываем сразу
+        with mock.patch(
+            'posts.thumbnails.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ), mock.patch('posts.thumbnails.get_executor') as get_executor:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'ThumbnailsPost', 'image': uploaded},
+            )
+        post = Post.objects.get(text='ThumbnailsPost')
+        get_executor.return_value.submit.assert_called_once_with(
+            mock.ANY, post.image.name
+        )
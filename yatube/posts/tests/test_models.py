@@ -1,7 +1,10 @@
+from unittest import mock
+
+import requests
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -66,3 +69,41 @@ class PostModelTest(TestCase):
                     self.post._meta.get_field(value).help_text,
                     expected
                 )
+
+    def test_video_embed_url(self):
+        """Адрес для iframe вычисляется при сохранении поста и комментария."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с видео',
+            video='https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        )
+        self.assertEqual(
+            post.video_embed_url,
+            'https://www.youtube.com/embed/dQw4w9WgXcQ?wmode=opaque'
+        )
+        comment = Comment.objects.create(
+            post=post,
+            author=self.user,
+            text='Комментарий',
+            comment_video='https://vimeo.com/76979871',
+        )
+        self.assertEqual(
+            comment.comment_video_embed_url,
+            'https://player.vimeo.com/video/76979871'
+        )
+        post.video = 'https://example.com/video'
+        post.save()
+        self.assertEqual(post.video_embed_url, '')
+
+    def test_video_embed_url_network_error(self):
+        """Ошибка сети у oEmbed-сервиса не мешает сохранить пост."""
+        with mock.patch(
+            'embed_video.backends.requests.get',
+            side_effect=requests.ConnectionError,
+        ):
+            post = Post.objects.create(
+                author=self.user,
+                text='Пост с треком',
+                video='https://soundcloud.com/glassnote/i-will-wait',
+            )
+        self.assertEqual(post.video_embed_url, '')
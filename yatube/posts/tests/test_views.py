@@ -1,13 +1,24 @@
+import base64
+import json
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post, User
+from .. import thumbnails, timeline
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      User, UserStats)
+from ..paginator import (NEXT, ApproximatePaginator, CursorPaginator,
+                         decode_cursor)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -151,6 +162,29 @@ class PostPagesTest(TestCase):
         self.assertEqual(post_author, self.post.author)
         self.assertEqual(post_image, self.post.image)
 
+    def test_post_detail_responsive_image(self):
+        urls = [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        # картинки с тем же именем из других тестов могли упасть в пуле
+        thumbnails._failed.clear()
+        # пока вариантов нет, страница отдаёт самый узкий и не ждёт остальных
+        for url in urls:
+            with mock.patch('core.templatetags.post_images.queue') as queue:
+                content = self.authorized_client.get(url).content.decode()
+            queue.assert_called_with(self.post.image.name)
+            self.assertNotIn('srcset', content)
+            self.assertNotIn(self.post.image.url, content)
+        # пул сам сбрасывает закэшированные страницы и карточки
+        thumbnails._generate_logged(self.post.image.name)
+        for url in urls:
+            content = self.authorized_client.get(url).content.decode()
+            self.assertIn('<source type="image/webp"', content)
+            for width in settings.POST_IMAGE_WIDTHS:
+                with self.subTest(url=url, width=width):
+                    self.assertIn(f' {width}w', content)
+
     # Тест создания поста
     def test_post_create(self):
         self.authorized_client.post(
@@ -236,6 +270,132 @@ class PostPagesTest(TestCase):
             author=self.subscriber
         ).exists())
 
+    def test_follow_twice_creates_one_row(self):
+        self.authorized_client.force_login(self.subscriber)
+        url = reverse('posts:profile_follow', args=[self.user.username])
+        self.authorized_client.get(url)
+        self.authorized_client.get(url)
+        self.assertEqual(Follow.objects.filter(
+            user=self.subscriber,
+            author=self.user
+        ).count(), 1)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.subscriber, author=self.user)
+
+    def test_follow_timeline(self):
+        follow = Follow.objects.create(
+            user=self.another_subscriber,
+            author=self.user
+        )
+        # подписка подтягивает уже опубликованные посты автора
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.another_subscriber,
+            post=self.post
+        ).exists())
+        new_post = Post.objects.create(text='fan-out', author=self.user)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.another_subscriber,
+            post=new_post
+        ).exists())
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.another_subscriber
+        ).exists())
+
+    def test_fan_out_trims_timeline(self):
+        Follow.objects.create(user=self.another_subscriber, author=self.user)
+        with self.settings(TIMELINE_SIZE=2):
+            posts = [
+                Post.objects.create(text=f'trim{i}', author=self.user)
+                for i in range(5)
+            ]
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.another_subscriber
+            ).order_by('-created', '-post').values_list('post', flat=True)),
+            [posts[-1].pk, posts[-2].pk]
+        )
+
+    def test_trim_keeps_entries_with_same_created(self):
+        Post.objects.bulk_create([
+            Post(text=f'same{i}', author=self.user) for i in range(3)
+        ])
+        posts = list(Post.objects.filter(
+            text__startswith='same'
+        ).order_by('id'))
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(
+                user=self.subscriber, post=post, created=posts[0].created
+            )
+            for post in posts
+        ])
+        with self.settings(TIMELINE_SIZE=2):
+            timeline.trim(self.subscriber.pk)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.subscriber
+            ).order_by('-post_id').values_list('post', flat=True)),
+            [posts[2].pk, posts[1].pk]
+        )
+
+    def test_fan_out_queries_do_not_grow_with_followers(self):
+        def publish():
+            with CaptureQueriesContext(connection) as queries:
+                Post.objects.create(text='fanned', author=self.user)
+            return len(queries)
+
+        with self.settings(TIMELINE_SIZE=1):
+            Follow.objects.create(user=self.subscriber, author=self.user)
+            publish()
+            few = publish()
+            Follow.objects.create(
+                user=self.another_subscriber, author=self.user
+            )
+            publish()
+            many = publish()
+        self.assertEqual(few, many)
+
+    def test_counters(self):
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.posts_count, 1)
+        follow = Follow.objects.create(
+            user=self.another_subscriber,
+            author=self.user
+        )
+        post = Post.objects.create(text='counted', author=self.user)
+        comment = Comment.objects.create(
+            post=post, author=self.subscriber, text='comment'
+        )
+        stats.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(UserStats.objects.get(
+            user=self.another_subscriber
+        ).following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        stats.refresh_from_db()
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count), (1, 0)
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 0
+        )
+
+    def test_reconcile_counters(self):
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        UserStats.objects.filter(user=self.subscriber).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(
+            user=self.user
+        ).posts_count, 1)
+        self.assertTrue(
+            UserStats.objects.filter(user=self.subscriber).exists()
+        )
+
 
 class PaginatorViewsTest(TestCase):
 
@@ -292,6 +452,138 @@ class PaginatorViewsTest(TestCase):
                     3
                 )
 
+    def test_elided_page_range(self):
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.elided_page_range, [1, 2])
+        paginator = CursorPaginator(list(range(1000)), 10)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, 2, '…', 47, 48, 49, 50, 51, 52, 53, '…', 99, 100]
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(3)),
+            [1, 2, 3, 4, 5, 6, '…', 99, 100]
+        )
+
+    def test_approximate_count(self):
+        posts = Post.objects.all()
+        # на SQLite оценки нет: счёт точный
+        self.assertEqual(ApproximatePaginator(posts, 10).count, 13)
+        with mock.patch('posts.paginator.estimate_count', return_value=10**6):
+            self.assertEqual(ApproximatePaginator(posts, 10).count, 10**6)
+            with self.settings(APPROXIMATE_COUNT_THRESHOLD=10**7):
+                self.assertEqual(ApproximatePaginator(posts, 10).count, 13)
+
+    def test_cursor_pages(self):
+        for rev in PaginatorViewsTest.reverses:
+            with self.subTest(rev=rev):
+                cache.clear()
+                first_page = self.client.get(rev).context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertIsNone(first_page.previous_cursor)
+                cache.clear()
+                second_page = self.client.get(
+                    rev, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertIsNone(second_page.next_cursor)
+                self.assertTrue(set(first_page).isdisjoint(second_page))
+                cache.clear()
+                back_page = self.client.get(
+                    rev, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        cache.clear()
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_malformed_cursors(self):
+        def token(payload):
+            raw = json.dumps(payload).encode()
+            return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+        created = self.post.created.isoformat()
+        cursors = {
+            'object': token({'a': 1}),
+            'list of two': token([NEXT, created]),
+            'list of four': token([NEXT, created, 1, 2]),
+            'huge id': token([NEXT, created, 10 ** 30]),
+            'negative id': token([NEXT, created, -10 ** 30]),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(cursor=name):
+                self.assertIsNone(decode_cursor(cursor))
+                for rev in PaginatorViewsTest.reverses:
+                    cache.clear()
+                    response = self.client.get(rev, {'cursor': cursor})
+                    self.assertEqual(len(response.context['page_obj']), 10)
+                response = self.client.get(
+                    reverse('posts:api_posts'), {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_comment_pages(self):
+        per_page = settings.COMMENTS_PER_PAGE
+        for i in range(per_page + 5):
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'comment{i}'
+            )
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        # авторы комментариев приходят тем же запросом, что и комментарии;
+        # ещё один запрос — имя автора поста для ETag
+        with self.assertNumQueries(5):
+            response = self.authorized_client.get(detail)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), per_page)
+        self.assertEqual(comments[0].text, 'comment0')
+        fragment = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': comments.next_cursor}
+        )
+        rest = fragment.context['comments']
+        self.assertEqual(
+            [comment.text for comment in rest],
+            [f'comment{i}' for i in range(per_page, per_page + 5)]
+        )
+        self.assertIsNone(rest.next_cursor)
+
+    def test_search(self):
+        search = reverse('posts:search')
+        response = self.client.get(search, {'q': 'testpost'})
+        first = response.context['page_obj']
+        self.assertEqual(len(first), settings.POST_AMOUNT)
+        second = self.client.get(
+            search, {'q': 'testpost', 'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 13 - settings.POST_AMOUNT)
+        self.assertIsNone(second.next_cursor)
+        self.assertFalse({post.pk for post in first} & {
+            post.pk for post in second
+        })
+
+    def test_search_ranks_text_above_comments(self):
+        commented = Post.objects.create(text='просто пост', author=self.user)
+        Comment.objects.create(
+            post=commented, author=self.user, text='кактус цветёт'
+        )
+        titled = Post.objects.create(text='мой кактус', author=self.user)
+        response = self.client.get(reverse('posts:search'), {'q': 'кактус'})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [titled.pk, commented.pk]
+        )
+        titled.delete()
+        response = self.client.get(reverse('posts:search'), {'q': 'кактус'})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [commented.pk]
+        )
+
 
 class CacheTests(TestCase):
 
@@ -319,8 +611,8 @@ class CacheTests(TestCase):
         context = response.context['page_obj']
         content = response.content
         self.assertIn(self.post, context)
-        post = Post.objects.filter(pk=self.post.id)
-        post.delete()
+        # удаление сбрасывает кэш, а bulk_create идёт в обход сигналов
+        Post.objects.bulk_create([Post(text='silentpost', author=self.user)])
         response_refresh = self.authorized_client.get(reverse('posts:index'))
         content_refresh = response_refresh.content
         self.assertEqual(content, content_refresh)
@@ -330,3 +622,228 @@ class CacheTests(TestCase):
         ))
         new_content_refresh = new_response_refresh.content
         self.assertNotEqual(content, new_content_refresh)
+
+    def test_conditional_get(self):
+        index = reverse('posts:index')
+        etag = self.client.get(index)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # у другого пользователя своя страница и свой ETag
+        response = self.authorized_client.get(
+            index, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        Post.objects.create(text='newpost', author=self.user)
+        response = self.client.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail_conditional_get(self):
+        post = Post.objects.create(text='etagpost', author=self.user)
+        detail = reverse('posts:post_detail', args=[post.pk])
+        etag = self.client.get(detail)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='comment'
+        )
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        comment.delete()
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # новый пост автора меняет число его постов на странице
+        Post.objects.create(text='another', author=self.user)
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        post.delete()
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_detail_etag_follows_csrf_token(self):
+        post = Post.objects.create(text='csrfpost', author=self.user)
+        detail = reverse('posts:post_detail', args=[post.pk])
+        self.authorized_client.cookies['csrftoken'] = 'a' * 64
+        etag = self.authorized_client.get(detail)['ETag']
+        response = self.authorized_client.get(
+            detail, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        # после нового входа токен другой: форма со старым не годится
+        self.authorized_client.cookies['csrftoken'] = 'b' * 64
+        response = self.authorized_client.get(
+            detail, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_scopes_get_expiring_versions(self):
+        urls = [
+            reverse('posts:group_list', args=['nosuchgroup']),
+            reverse('posts:profile', args=['nosuchuser']),
+            reverse('posts:api_posts') + '?author=nosuchauthor',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+                    self.client.get(url)
+                timeouts = [
+                    call[0][2] for call in add.call_args_list
+                    if call[0][0].startswith('posts:version:')
+                ]
+                self.assertTrue(timeouts)
+                self.assertNotIn(None, timeouts)
+
+    def test_deleted_post_conditional_get(self):
+        post = Post.objects.create(
+            text='etagdeleted', group=self.group, author=self.user
+        )
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        etags = {}
+        for page in pages:
+            etags[page] = self.authorized_client.get(page)['ETag']
+            response = self.authorized_client.get(
+                page, HTTP_IF_NONE_MATCH=etags[page]
+            )
+            self.assertEqual(response.status_code, 304)
+        post.delete()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(
+                    page, HTTP_IF_NONE_MATCH=etags[page]
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etags[page])
+                self.assertNotContains(response, 'etagdeleted')
+
+    def test_feeds(self):
+        Post.objects.create(
+            text='feedtext', group=self.group, author=self.user
+        )
+        feeds = [
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', args=[self.group.slug]),
+            reverse('posts:group_atom', args=[self.group.slug]),
+            reverse('posts:profile_rss', args=[self.user.username]),
+            reverse('posts:profile_atom', args=[self.user.username]),
+        ]
+        for feed in feeds:
+            with self.subTest(feed=feed):
+                response = self.client.get(feed)
+                self.assertContains(response, 'feedtext')
+                etag = response['ETag']
+                response = self.client.get(feed, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        # новый пост сбрасывает закэшированные ленты своих областей
+        Post.objects.create(text='freshpost', group=self.group,
+                            author=self.user)
+        for feed in feeds:
+            with self.subTest(feed=feed):
+                self.assertContains(self.client.get(feed), 'freshpost')
+
+    def test_follow_keeps_index_cache(self):
+        author = User.objects.create(username='testauthor_cache')
+        response = self.authorized_client.get(reverse('posts:index'))
+        content = response.content
+        Post.objects.bulk_create([Post(text='silentpost', author=self.user)])
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        # подписка не сбрасывает чужие страницы
+        response_refresh = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(content, response_refresh.content)
+
+    def test_new_post_invalidates_index_cache(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.create(text='freshpost', author=self.user)
+        response_refresh = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, response_refresh.content)
+        self.assertIn('freshpost', response_refresh.content.decode())
+
+    def test_deleted_post_invalidates_feeds(self):
+        post = Post.objects.create(
+            text='deletedtext', group=self.group, author=self.user
+        )
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:index_rss'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:group_atom', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:profile_rss', args=[self.user.username]),
+            reverse('posts:api_posts'),
+        ]
+        etags = {}
+        for page in pages:
+            response = self.client.get(page)
+            self.assertContains(response, 'deletedtext')
+            etags[page] = response['ETag']
+        post.delete()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.client.get(
+                    page, HTTP_IF_NONE_MATCH=etags[page]
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etags[page])
+                self.assertNotContains(response, 'deletedtext')
+
+    def test_deleted_group_invalidates_cards(self):
+        group = Group.objects.create(title='gonegroup', slug='gonegroup')
+        Post.objects.create(text='grouptext', group=group, author=self.user)
+        link = reverse('posts:group_list', args=[group.slug])
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        for page in pages:
+            self.assertContains(self.client.get(page), link)
+        group.delete()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.client.get(page)
+                self.assertContains(response, 'grouptext')
+                self.assertNotContains(response, link)
+
+    def test_stale_index_served_while_rebuilding(self):
+        with self.settings(FEED_CACHE={'index': {'timeout': 0}}):
+            content = self.authorized_client.get(
+                reverse('posts:index')
+            ).content
+            Post.objects.bulk_create([
+                Post(text='silentpost', author=self.user)
+            ])
+            # страница уже истекла, но её пересобирает другой запрос
+            with mock.patch.object(cache, 'add', return_value=False):
+                response = self.authorized_client.get(reverse('posts:index'))
+            self.assertEqual(content, response.content)
+            response = self.authorized_client.get(reverse('posts:index'))
+            self.assertNotEqual(content, response.content)
+
+    def test_post_card_cache(self):
+        index = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('cachetext', index.content.decode())
+        # изменение в обход сигналов карточку не сбрасывает
+        Post.objects.filter(pk=self.post.pk).update(text='hiddentext')
+        profile = self.authorized_client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertIn('cachetext', profile.content.decode())
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            data={'text': 'editedtext'},
+        )
+        profile = self.authorized_client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertIn('editedtext', profile.content.decode())
@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import timing
+
+from . import cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Варианты картинок поста: каждая ширина в WebP и JPEG для srcset.
+# Пропорции повторяют прежнюю миниатюру 960x339.
+RENDITION_STYLES = {
+    # лента, posts/includes/post_list.html
+    'card': {'padding': True},
+    # страница поста, posts/post_detail.html
+    'detail': {'crop': 'center', 'upscale': True},
+}
+RENDITION_FORMATS = ('WEBP', 'JPEG')
+ASPECT_RATIO = 339 / 960
+
+
+def geometry(width):
+    return f'{width}x{round(width * ASPECT_RATIO)}'
+
+
+def rendition_options():
+    """Все пары (геометрия, опции sorl), которые нужны шаблонам."""
+    return [
+        (geometry(width), dict(options, format=image_format))
+        for options in RENDITION_STYLES.values()
+        for width in settings.POST_IMAGE_WIDTHS
+        for image_format in RENDITION_FORMATS
+    ]
+
+
+def find_thumbnail(image, geometry_string, **options):
+    """
+    Готовая миниатюра из хранилища ключей sorl или None. В отличие от
+    get_thumbnail ничего не создаёт: опции дополняются так же, как в
+    ThumbnailBackend.get_thumbnail, чтобы имя файла совпало.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry_string, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def renditions(image, style):
+    """
+    Возвращает {формат: [(url, ширина), ...]} для картинки поста или
+    None, если каких-то вариантов ещё нет: запрос их не создаёт.
+    """
+    options = RENDITION_STYLES[style]
+    result = {}
+    with timing.timed('thumbnail'):
+        for image_format in RENDITION_FORMATS:
+            variants = []
+            for width in settings.POST_IMAGE_WIDTHS:
+                thumbnail = find_thumbnail(
+                    image, geometry(width), format=image_format, **options
+                )
+                if thumbnail is None:
+                    return None
+                variants.append((thumbnail.url, width))
+            result[image_format] = variants
+    return result
+
+
+def fallback(image, style):
+    """
+    URL самого узкого JPEG-варианта: пока пул готовит остальные, страница
+    показывает его, а не исходник. Создаётся одна небольшая миниатюра из
+    тех же, что делает generate.
+    """
+    if recently_failed(image.name):
+        # картинка не открылась у пула, в запросе она не откроется тоже
+        return image.url
+    with timing.timed('thumbnail'):
+        return get_thumbnail(
+            image,
+            geometry(min(settings.POST_IMAGE_WIDTHS)),
+            format='JPEG',
+            **RENDITION_STYLES[style]
+        ).url
+
+
+def refresh_pages(name):
+    """
+    Сбрасывает карточки и страницы постов с картинкой: в кэше они
+    остались с запасным вариантом вместо srcset.
+    """
+    scopes = {'index'}
+    for post_id, username, slug in Post.objects.filter(
+        image=name
+    ).values_list('pk', 'author__username', 'group__slug'):
+        scopes.update((f'post:{post_id}', f'profile:{username}'))
+        if slug:
+            scopes.add(f'group:{slug}')
+    cache.bump(*scopes)
+
+
+_executor = None
+# картинки, которые уже ждут в пуле: повторные показы их не добавляют
+_pending = set()
+# картинки, у которых генерация упала: время, после которого её повторить
+_failed = {}
+_pending_lock = threading.Lock()
+# через сколько секунд снова пробовать картинку, которая не открылась
+RETRY_FAILED_AFTER = 60 * 60
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def shutdown():
+    """Дожидается фоновых задач и останавливает пул (тесты, выход)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def generate(image):
+    """Создаёт все миниатюры картинки поста, если их ещё нет."""
+    try:
+        for size, options in rendition_options():
+            get_thumbnail(image, size, **options)
+    finally:
+        close_old_connections()
+
+
+def _generate_logged(image):
+    try:
+        generate(image)
+        # без THUMBNAIL_DEBUG sorl не бросает ошибку на битом исходнике,
+        # а просто ничего не сохраняет
+        if any(renditions(image, style) is None for style in RENDITION_STYLES):
+            raise OSError('варианты не сохранились')
+        refresh_pages(image)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image)
+        with _pending_lock:
+            _failed[image] = time.monotonic() + RETRY_FAILED_AFTER
+    finally:
+        close_old_connections()
+        with _pending_lock:
+            _pending.discard(image)
+
+
+def recently_failed(name):
+    with _pending_lock:
+        return _failed.get(name, 0) > time.monotonic()
+
+
+def queue(name):
+    """
+    Отдаёт картинку пулу, если она ещё не ждёт там своей очереди
+    и недавно не падала.
+    """
+    with _pending_lock:
+        if name in _pending or _failed.get(name, 0) > time.monotonic():
+            return
+        _failed.pop(name, None)
+        _pending.add(name)
+    get_executor().submit(_generate_logged, name)
+
+
+def schedule(post):
+    """Ставит миниатюры поста в очередь после коммита транзакции."""
+    if not post.image:
+        return
+    name = post.image.name
+    transaction.on_commit(lambda: queue(name))
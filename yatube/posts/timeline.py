@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Follow, Post, TimelineEntry, User
+
+
+def fan_out(post):
+    """
+    Раскладывает новый пост по лентам всех подписчиков автора.
+    Возвращает id подписчиков, чьи ленты изменились.
+    """
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in followers
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    trim_many(followers)
+    return followers
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора, на которого подписались."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by('-created', '-id').values_list('id', 'created')
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for post_id, created in posts[:settings.TIMELINE_SIZE]
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def trim(user_id):
+    """Оставляет в ленте не больше TIMELINE_SIZE самых свежих записей."""
+    trim_many([user_id])
+
+
+def trim_many(user_ids, chunk_size=100):
+    """
+    trim для многих лент сразу: на порцию пользователей один запрос за
+    первой лишней записью каждой ленты и одно удаление всего, что не
+    новее её по (created, post_id).
+    """
+    size = settings.TIMELINE_SIZE
+    for start in range(0, len(user_ids), chunk_size):
+        first_dropped = TimelineEntry.objects.filter(
+            user_id=OuterRef('pk')
+        ).order_by('-created', '-post_id')
+        boundaries = User.objects.filter(
+            pk__in=user_ids[start:start + chunk_size]
+        ).annotate(
+            dropped_created=Subquery(
+                first_dropped.values('created')[size:size + 1]
+            ),
+            dropped_post=Subquery(
+                first_dropped.values('post_id')[size:size + 1]
+            ),
+        ).filter(dropped_created__isnull=False).values_list(
+            'pk', 'dropped_created', 'dropped_post'
+        )
+        # у постов с одинаковым created граница — ещё и по post_id,
+        # иначе вместе с лишними ушли бы и оставленные записи
+        dropped = Q()
+        for user_id, created, post_id in boundaries:
+            dropped |= Q(user_id=user_id) & (
+                Q(created__lt=created)
+                | Q(created=created, post_id__lte=post_id)
+            )
+        if dropped:
+            TimelineEntry.objects.filter(dropped).delete()
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Собирает ленту пользователя заново по его текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    # одна выборка по всем авторам вместо backfill и trim на каждого
+    posts = Post.objects.filter(
+        author_id__in=Follow.objects.filter(
+            user_id=user_id
+        ).values('author_id')
+    ).order_by('-created', '-id').values_list('id', 'created')
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for post_id, created in posts[:settings.TIMELINE_SIZE]
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -10,11 +10,31 @@ urlpatterns = [
         views.index,
         name='index'
     ),
+    path(
+        'rss/',
+        feeds.index_rss,
+        name='index_rss'
+    ),
+    path(
+        'atom/',
+        feeds.index_atom,
+        name='index_atom'
+    ),
     path(
         'profile/<str:username>/',
         views.profile,
         name='profile'
     ),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.profile_rss,
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.profile_atom,
+        name='profile_atom'
+    ),
     path(
         'posts/<int:post_id>',
         views.post_detail,
@@ -25,6 +45,21 @@ urlpatterns = [
         views.group_posts,
         name='group_list'
     ),
+    path(
+        'group/<slug:slug>/rss/',
+        feeds.group_rss,
+        name='group_rss'
+    ),
+    path(
+        'group/<slug:slug>/atom/',
+        feeds.group_atom,
+        name='group_atom'
+    ),
+    path(
+        'search/',
+        views.search_posts,
+        name='search'
+    ),
     path(
         'create/',
         views.post_create,
@@ -35,6 +70,11 @@ urlpatterns = [
         views.post_edit,
         name='post_edit',
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -55,4 +95,34 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'api/v1/posts/',
+        api.posts,
+        name='api_posts'
+    ),
+    path(
+        'api/v1/posts/<int:post_id>/',
+        api.post,
+        name='api_post'
+    ),
+    path(
+        'api/v1/posts/<int:post_id>/comments/',
+        api.comments,
+        name='api_comments'
+    ),
+    path(
+        'api/v1/groups/',
+        api.groups,
+        name='api_groups'
+    ),
+    path(
+        'api/v1/follow/',
+        api.follow,
+        name='api_follow'
+    ),
+    path(
+        'export/<str:kind>/',
+        views.export_data,
+        name='export'
+    ),
 ]
@@ -0,0 +1,17 @@
+import requests
+from embed_video.backends import EmbedVideoException, detect_backend
+
+
+def embed_url(url):
+    """
+    Адрес для iframe с видео: сервис и id ролика определяются один раз
+    при сохранении, а не при каждой отрисовке тегом {% video %}.
+    """
+    if not url:
+        return ''
+    try:
+        return detect_backend(url).url
+    except (EmbedVideoException, requests.RequestException):
+        # oEmbed-сервис (например, SoundCloud) недоступен: сохраняем
+        # без iframe, а не роняем сохранение поста
+        return ''
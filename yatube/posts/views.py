@@ -1,29 +1,38 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
-from django.http import HttpResponseRedirect
+from django.db import transaction
+from django.http import (Http404, HttpResponseBadRequest, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.views.decorators.cache import cache_page
-from django.conf import settings
+from django.views.decorators.http import condition, require_safe
 
+from . import counters, export, search, thumbnails
+from .cache import (cache_feed, follow_scope, group_scope, index_scope,
+                    page_etag, post_scope, profile_scope, set_card_versions)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .paginator import paginator_method
+from .models import Follow, Group, Post, TimelineEntry, User
+from .paginator import comments_page, paginator_method
 
 
-@cache_page(settings.CACHE_TIME)
+@condition(etag_func=page_etag(index_scope))
+@cache_feed(index_scope)
 def index(request):
     posts = Post.objects.select_related('group', 'author').all()
     page_obj = paginator_method(request, posts)
+    set_card_versions(page_obj)
     template = 'posts/index.html'
     context = {'page_obj': page_obj}
     return render(request, template, context)
 
 
+@condition(etag_func=page_etag(group_scope))
+@cache_feed(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author', 'group')
     page_obj = paginator_method(request, posts)
+    set_card_versions(page_obj)
     context = {
         'group': group,
         'key_group_posts': 'Записи сообщества ',
@@ -33,11 +42,14 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@condition(etag_func=page_etag(profile_scope))
+@cache_feed(profile_scope)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    posts_count = author.posts.count()
-    page_obj = paginator_method(request, author_posts)
+    author_posts = author.posts.select_related('author', 'group')
+    posts_count = counters.user_stats(author).posts_count
+    page_obj = paginator_method(request, author_posts, count=posts_count)
+    set_card_versions(page_obj)
     following = True
     if request.user.is_authenticated:
         follow = Follow.objects.filter(
@@ -57,11 +69,14 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@condition(etag_func=page_etag(post_scope, csrf=True))
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    amount = post.author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    amount = counters.user_stats(post.author).posts_count
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = comments_page(request, post)
     context = {
         'post': post,
         'amount': amount,
@@ -71,7 +86,32 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    # следующая порция комментариев для подгрузки на странице поста
+    post = get_object_or_404(Post, id=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search_posts(request):
+    # полнотекстовый поиск по постам и комментариям, лучшие совпадения выше
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search.search_page(query, request.GET.get('cursor'))
+        set_card_versions(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     # A dictionary-like object containing all given HTTP POST parameters,
     # providing that the request contains form data.
@@ -83,6 +123,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', post.author)
     context = {'form': form, 'is_edit': False}
     return render(request, 'posts/create_post.html', context)
@@ -104,6 +145,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return HttpResponseRedirect(
             reverse('posts:post_detail', args=[post_id])
         )
@@ -116,6 +159,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -131,36 +175,63 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_feed(follow_scope)
 def follow_index(request):
-    follow_request = request.user.follower.all().values('author')
-    posts = Post.objects.filter(author__in=follow_request)
-    page_obj = paginator_method(request, posts)
+    # лента заранее разложена по TimelineEntry при публикации постов
+    entries = TimelineEntry.objects.filter(
+        user=request.user
+    ).select_related('post__author', 'post__group')
+    page_obj = paginator_method(request, entries, keys=('created', 'post_id'))
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
+    set_card_versions(page_obj)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     # Подписаться на автора
     following = get_object_or_404(User, username=username)
-    follow_object = request.user.follower.filter(
-        author_id=following.id
-    ).exists()
-    if (
-        request.user != following
-        and (not follow_object)
-    ):
-        Follow.objects.create(user=request.user, author=following)
-        cache.clear()
+    if request.user != following:
+        # пара (user, author) уникальна: повторная подписка ничего не создаст
+        Follow.objects.get_or_create(user=request.user, author=following)
     return redirect('posts:index')
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     # Дизлайк, отписка
     follower = get_object_or_404(User, username=request.user)
     following = get_object_or_404(User, username=username)
     follow_object = Follow.objects.filter(user=follower, author=following)
     follow_object.delete()
-    cache.clear()
     return redirect('posts:index')
+
+
+@staff_member_required
+@require_safe
+def export_data(request, kind):
+    # потоковая выгрузка для сотрудников, как у команды export_data
+    output_format = request.GET.get('format', 'ndjson')
+    if kind not in export.EXPORTS or output_format not in export.FORMATS:
+        raise Http404
+    try:
+        records = export.rows(
+            kind,
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+            group=request.GET.get('group'),
+            author=request.GET.get('author'),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        export.stream(kind, output_format, records),
+        content_type=f'{export.FORMATS[output_format][0]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{output_format}"'
+    )
+    return response
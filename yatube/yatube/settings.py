@@ -59,9 +59,16 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # метаданные миниатюр sorl живут отдельно от кэша страниц
+    'thumbnails': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'thumbnails',
+    },
 }
 
+THUMBNAIL_CACHE = 'thumbnails'
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -81,6 +88,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,7 +110,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.timing.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -176,4 +185,90 @@ STATIC_URL = '/static/'
 
 POST_AMOUNT = 10
 
+# комментариев на странице поста и в каждой догружаемой порции
+COMMENTS_PER_PAGE = 20
+
+# словарь PostgreSQL для полнотекстового поиска (to_tsvector)
+SEARCH_CONFIG = 'russian'
+
+# с какого числа строк пагинаторы берут оценку планировщика PostgreSQL
+# вместо точного COUNT(*); на других БД счёт всегда точный
+APPROXIMATE_COUNT_THRESHOLD = 100000
+
 CACHE_TIME = 20
+
+# сколько секунд после CACHE_TIME можно отдавать устаревшую страницу,
+# пока один из запросов собирает новую
+CACHE_STALE_TIME = 60
+
+# множитель вероятностного досрочного обновления кэша (0 — выключено)
+CACHE_EARLY_BETA = 1.0
+
+# настройки кэша отдельных лент поверх значений по умолчанию
+FEED_CACHE = {
+    'index': {'timeout': CACHE_TIME},
+    'group_posts': {'timeout': CACHE_TIME},
+    'profile': {'timeout': CACHE_TIME},
+    'follow_index': {'timeout': CACHE_TIME},
+    # RSS и Atom: при новых постах сбрасываются через cache.bump
+    'feeds': {'timeout': 5 * 60},
+    # ответы JSON API, сбрасываются через cache.bump, как и страницы
+    'api': {'timeout': 5 * 60},
+}
+
+# сколько последних постов отдают ленты RSS и Atom
+FEED_ITEMS = 20
+
+# сколько групп в одном ответе /api/v1/groups/
+API_GROUPS_PER_PAGE = 100
+
+# сколько строк за раз читают выгрузки export_data (серверный курсор)
+EXPORT_CHUNK_SIZE = 2000
+
+# сколько последних постов хранится в ленте подписок пользователя
+TIMELINE_SIZE = 1000
+
+# потоки, в которых заранее готовятся миниатюры загруженных картинок
+THUMBNAIL_WORKERS = 2
+
+# ширины вариантов картинки поста для srcset
+POST_IMAGE_WIDTHS = (320, 640, 960)
+
+# бюджет SQL-запросов и времени в базе (секунды) на один запрос к
+# представлению; ключ — имя URL, недостающие значения берутся из DEFAULT
+QUERY_BUDGET_DEFAULT = {'queries': 30, 'time': 0.5}
+QUERY_BUDGETS = {
+    'posts:index': {'queries': 10},
+    'posts:group_list': {'queries': 10},
+    'posts:profile': {'queries': 12},
+    'posts:follow_index': {'queries': 10},
+    'posts:post_detail': {'queries': 10},
+    'posts:post_comments': {'queries': 6},
+}
+
+# превышение бюджета: True — исключение, False — предупреждение в логе
+QUERY_BUDGET_RAISE = False
+
+# доля запросов, для которых пишутся Server-Timing и строка в yatube.perf
+PERF_SAMPLE_RATE = 0.1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'perf': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.perf': {
+            'handlers': ['perf'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}